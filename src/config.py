@@ -1,16 +1,18 @@
 """Configuration management for Meshtastic MQTT Monitor."""
 
 import argparse
+import functools
 import os
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional
-
-import yaml
+import sys
+from dataclasses import asdict, dataclass, field
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
 
 
 # Hardware model mapping (number to name)
 # Based on Meshtastic protobuf HardwareModel enum
-HARDWARE_MODELS = {
+# Read-only and shared by every MonitorConfig; copy it before modifying
+HARDWARE_MODELS: Mapping[int, str] = MappingProxyType({
     0: "UNSET",
     1: "TLORA_V2",
     2: "TLORA_V1",
@@ -94,10 +96,141 @@ HARDWARE_MODELS = {
     80: "HELTEC_WIRELESS_PAPER_V1_1",
     81: "PRIVATE_HW",
     255: "RESERVED",
-}
-
-
-@dataclass
+})
+
+# Model numbers below this are dense (0 up to PRIVATE_HW) and resolved by
+# tuple index; the rest, such as 255 (RESERVED), go through the mapping
+_HARDWARE_MODEL_TABLE_SIZE = max(model for model in HARDWARE_MODELS if model < 255) + 1
+
+
+def hardware_model_table(models: Mapping[int, str]) -> Tuple[str, ...]:
+    """
+    Build a tuple of hardware model names indexed by model number.
+    
+    Indexing the tuple is cheaper than hashing into the mapping for every
+    NODEINFO packet. It covers the dense low range of model numbers only.
+    
+    Args:
+        models: Hardware model number to name mapping
+        
+    Returns:
+        Model names for numbers 0 to the end of the dense range, with
+        "UNKNOWN" for numbers missing from models
+    """
+    return tuple(models.get(model, "UNKNOWN") for model in range(_HARDWARE_MODEL_TABLE_SIZE))
+
+
+_HARDWARE_MODEL_NAMES = hardware_model_table(HARDWARE_MODELS)
+
+
+def hardware_model_name(model: int) -> str:
+    """
+    Look up the name of a hardware model number.
+    
+    Args:
+        model: HardwareModel enum value
+        
+    Returns:
+        Model name, or "UNKNOWN" if the number isn't recognised
+    """
+    if 0 <= model < len(_HARDWARE_MODEL_NAMES):
+        return _HARDWARE_MODEL_NAMES[model]
+    return HARDWARE_MODELS.get(model, "UNKNOWN")
+
+
+# Default display fields for common packet types. The tables below are
+# read-only views with tuple field lists, so they can be shared with parsed
+# configurations without defensive copies.
+_DEFAULT_DISPLAY_FIELDS: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    # Position/Location data
+    "POSITION": ("latitude", "longitude", "altitude", "timestamp"),
+    "POSITION_APP": ("latitude", "longitude", "altitude", "timestamp"),
+    
+    # Text messaging
+    "TEXT_MESSAGE_APP": ("text", "timestamp"),
+    
+    # Telemetry data
+    "TELEMETRY_APP": ("battery_level", "voltage", "temperature", "channel_utilization", "air_util_tx"),
+    
+    # Node information
+    "NODEINFO_APP": ("node_id", "long_name", "short_name", "hardware_model", "role"),
+    
+    # Routing information
+    "ROUTING_APP": ("route_request", "route_reply", "error_reason"),
+    
+    # Administrative messages
+    "ADMIN_APP": ("admin_message",),
+    
+    # Waypoint data
+    "WAYPOINT_APP": ("name", "description", "latitude", "longitude"),
+    
+    # Neighbor info
+    "NEIGHBORINFO_APP": ("node_id", "snr", "node_broadcast_interval_secs"),
+    
+    # Traceroute
+    "TRACEROUTE_APP": ("route",),
+    
+    # Detection sensor
+    "DETECTION_SENSOR_APP": ("name", "timestamp"),
+    
+    # Range test
+    "RANGE_TEST_APP": ("seq", "timestamp"),
+    
+    # Store and forward
+    "STORE_FORWARD_APP": ("rr", "stats", "history", "heartbeat"),
+    
+    # Remote hardware
+    "REMOTE_HARDWARE_APP": ("type", "gpio_pin", "gpio_value"),
+    
+    # Paxcounter
+    "PAXCOUNTER_APP": ("wifi", "ble"),
+})
+
+# Default colors for packet types
+# Colors chosen to be visible on both light and dark terminals
+_DEFAULT_PACKET_COLORS: Mapping[str, str] = MappingProxyType({
+    "POSITION": "green",
+    "POSITION_APP": "green",
+    "TEXT_MESSAGE_APP": "cyan",
+    "TELEMETRY_APP": "yellow",
+    "NODEINFO_APP": "blue",
+    "ROUTING_APP": "magenta",
+    "ADMIN_APP": "red",
+    "WAYPOINT_APP": "green_bold",
+    "NEIGHBORINFO_APP": "blue_bold",
+    "TRACEROUTE_APP": "magenta_bold",
+    "DETECTION_SENSOR_APP": "yellow_bold",
+    "RANGE_TEST_APP": "cyan_bold",
+    "STORE_FORWARD_APP": "white_bold",
+    "REMOTE_HARDWARE_APP": "red_bold",
+    "PAXCOUNTER_APP": "yellow",
+    "default": "white",
+})
+
+# Default keyword highlights as (keyword, case_sensitive, color) tuples
+# (examples - users can add their own). Using bold colors for better
+# visibility on both light and dark terminals.
+_DEFAULT_KEYWORDS: Tuple[Tuple[str, bool, str], ...] = (
+    ("emergency", False, "red_bold"),
+    ("alert", False, "yellow_bold"),
+    ("error", False, "red"),
+    ("warning", False, "yellow"),
+)
+_DEFAULT_KEYWORD_HIGHLIGHTS: Mapping[str, str] = MappingProxyType({
+    keyword: color for keyword, _, color in _DEFAULT_KEYWORDS
+})
+
+# Default encryption keys for common channels
+_DEFAULT_CHANNEL_KEYS: Mapping[str, str] = MappingProxyType({
+    "LongFast": "AQ==",  # Default Meshtastic encryption key
+})
+
+# Options for the package's dataclasses (also used by the decoder); slots=True
+# drops the per-instance __dict__ but is only supported on Python 3.10+
+DATACLASS_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**DATACLASS_OPTIONS)
 class MQTTConfig:
     """MQTT broker connection configuration."""
 
@@ -109,7 +242,7 @@ class MQTTConfig:
     ca_cert: Optional[str] = None
 
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class ChannelConfig:
     """Channel-specific configuration including encryption."""
 
@@ -117,7 +250,7 @@ class ChannelConfig:
     encryption_key: Optional[str] = None
 
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class DisplayFieldConfig:
     """Display field configuration for a specific packet type."""
 
@@ -125,7 +258,7 @@ class DisplayFieldConfig:
     fields: List[str] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class ColorConfig:
     """Color configuration for packet types and keywords."""
 
@@ -133,7 +266,7 @@ class ColorConfig:
     keyword_highlights: Dict[str, str] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class KeywordConfig:
     """Keyword highlighting configuration."""
 
@@ -142,7 +275,7 @@ class KeywordConfig:
     color: str = "white"
 
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class MonitorConfig:
     """Complete monitor application configuration."""
 
@@ -153,12 +286,55 @@ class MonitorConfig:
     display_fields: Dict[str, List[str]] = field(default_factory=dict)
     colors: ColorConfig = field(default_factory=ColorConfig)
     keywords: List[KeywordConfig] = field(default_factory=list)
-    hardware_models: Dict[int, str] = field(default_factory=lambda: HARDWARE_MODELS.copy())
+    hardware_models: Mapping[int, str] = field(default_factory=lambda: HARDWARE_MODELS)
     filter_type: Optional[str] = None  # Filter to specific packet type
     filter_text: Optional[str] = None  # Filter messages containing text (grep-like)
     hide_decode_errors: bool = False  # Hide messages that failed to decode
 
 
+def _intern(value):
+    """Intern strings so lookups against decoder output compare by identity."""
+    return sys.intern(value) if type(value) is str else value
+
+
+def _import_yaml():
+    """
+    Import PyYAML on first use.
+    
+    Deferred so that paths which never touch a config file (``--help``,
+    ``--version``) don't pay its import cost.
+    
+    Returns:
+        Tuple of the yaml module and the fastest available safe loader
+        and dumper classes
+    """
+    import yaml
+    
+    # libyaml-backed classes are several times faster; fall back when
+    # PyYAML is built without libyaml
+    return (
+        yaml,
+        getattr(yaml, "CSafeLoader", yaml.SafeLoader),
+        getattr(yaml, "CSafeDumper", yaml.SafeDumper),
+    )
+
+
+# CLI options copied verbatim onto MQTTConfig / MonitorConfig when given;
+# each argparse dest matches the attribute it overrides
+_CLI_MQTT_OVERRIDES = ("host", "port", "username", "password", "use_tls", "ca_cert")
+_CLI_CONFIG_OVERRIDES = ("topic", "filter_type", "filter_text", "hide_decode_errors")
+
+# --color-* option dests and the packet type each one recolours
+_COLOR_ARG_MAPPINGS: Tuple[Tuple[str, str], ...] = (
+    ("color_position", "POSITION"),
+    ("color_text_message_app", "TEXT_MESSAGE_APP"),
+    ("color_telemetry_app", "TELEMETRY_APP"),
+    ("color_nodeinfo_app", "NODEINFO_APP"),
+    ("color_routing_app", "ROUTING_APP"),
+    ("color_admin_app", "ADMIN_APP"),
+)
+
+
 class ConfigManager:
     """Manages configuration loading, validation, and merging."""
 
@@ -167,103 +343,33 @@ class ConfigManager:
     @staticmethod
     def get_default_config() -> MonitorConfig:
         """Generate default configuration with standard values."""
-        config = MonitorConfig()
-        
-        # Set default display fields for common packet types
-        config.display_fields = {
-            # Position/Location data
-            "POSITION": ["latitude", "longitude", "altitude", "timestamp"],
-            "POSITION_APP": ["latitude", "longitude", "altitude", "timestamp"],
-            
-            # Text messaging
-            "TEXT_MESSAGE_APP": ["text", "timestamp"],
-            
-            # Telemetry data
-            "TELEMETRY_APP": ["battery_level", "voltage", "temperature", "channel_utilization", "air_util_tx"],
-            
-            # Node information
-            "NODEINFO_APP": ["node_id", "long_name", "short_name", "hardware_model", "role"],
-            
-            # Routing information
-            "ROUTING_APP": ["route_request", "route_reply", "error_reason"],
-            
-            # Administrative messages
-            "ADMIN_APP": ["admin_message"],
-            
-            # Waypoint data
-            "WAYPOINT_APP": ["name", "description", "latitude", "longitude"],
-            
-            # Neighbor info
-            "NEIGHBORINFO_APP": ["node_id", "snr", "node_broadcast_interval_secs"],
-            
-            # Traceroute
-            "TRACEROUTE_APP": ["route"],
-            
-            # Detection sensor
-            "DETECTION_SENSOR_APP": ["name", "timestamp"],
-            
-            # Range test
-            "RANGE_TEST_APP": ["seq", "timestamp"],
-            
-            # Store and forward
-            "STORE_FORWARD_APP": ["rr", "stats", "history", "heartbeat"],
-            
-            # Remote hardware
-            "REMOTE_HARDWARE_APP": ["type", "gpio_pin", "gpio_value"],
-            
-            # Paxcounter
-            "PAXCOUNTER_APP": ["wifi", "ble"],
-        }
-        
-        # Set default colors for packet types
-        # Colors chosen to be visible on both light and dark terminals
-        config.colors.packet_type_colors = {
-            "POSITION": "green",
-            "POSITION_APP": "green",
-            "TEXT_MESSAGE_APP": "cyan",
-            "TELEMETRY_APP": "yellow",
-            "NODEINFO_APP": "blue",
-            "ROUTING_APP": "magenta",
-            "ADMIN_APP": "red",
-            "WAYPOINT_APP": "green_bold",
-            "NEIGHBORINFO_APP": "blue_bold",
-            "TRACEROUTE_APP": "magenta_bold",
-            "DETECTION_SENSOR_APP": "yellow_bold",
-            "RANGE_TEST_APP": "cyan_bold",
-            "STORE_FORWARD_APP": "white_bold",
-            "REMOTE_HARDWARE_APP": "red_bold",
-            "PAXCOUNTER_APP": "yellow",
-            "default": "white",
-        }
-        
-        # Set default keyword highlights (examples - users can add their own)
-        # Using bold colors for better visibility on both light and dark terminals
-        config.keywords = [
-            KeywordConfig(keyword="emergency", case_sensitive=False, color="red_bold"),
-            KeywordConfig(keyword="alert", case_sensitive=False, color="yellow_bold"),
-            KeywordConfig(keyword="error", case_sensitive=False, color="red"),
-            KeywordConfig(keyword="warning", case_sensitive=False, color="yellow"),
-        ]
-        
-        # Build keyword highlights dict from keywords list
-        config.colors.keyword_highlights = {kw.keyword: kw.color for kw in config.keywords}
-        
-        # Set default encryption keys for common channels
-        config.channel_keys = {
-            "LongFast": "AQ==",  # Default Meshtastic encryption key
-        }
-        
-        return config
+        # Build fresh containers so callers can mutate the result freely
+        return MonitorConfig(
+            channel_keys=dict(_DEFAULT_CHANNEL_KEYS),
+            display_fields={
+                packet_type: list(fields)
+                for packet_type, fields in _DEFAULT_DISPLAY_FIELDS.items()
+            },
+            colors=ColorConfig(
+                packet_type_colors=dict(_DEFAULT_PACKET_COLORS),
+                keyword_highlights=dict(_DEFAULT_KEYWORD_HIGHLIGHTS),
+            ),
+            keywords=[KeywordConfig(*spec) for spec in _DEFAULT_KEYWORDS],
+        )
 
     @staticmethod
-    def load_config(file_path: str = DEFAULT_CONFIG_PATH) -> MonitorConfig:
+    def load_config(
+        file_path: str = DEFAULT_CONFIG_PATH, write_default: bool = True
+    ) -> MonitorConfig:
         """
         Load configuration from YAML file.
         
-        If the file doesn't exist, creates a default configuration file.
+        If the file doesn't exist, the default configuration is returned and,
+        unless write_default is False, written to file_path.
         
         Args:
             file_path: Path to the configuration file
+            write_default: Create file_path with the defaults if it is missing
             
         Returns:
             MonitorConfig object with loaded configuration
@@ -272,15 +378,19 @@ class ConfigManager:
             ValueError: If the configuration file is invalid
         """
         if not os.path.exists(file_path):
-            # Create default configuration file
-            default_config = ConfigManager.get_default_config()
-            ConfigManager._save_config(default_config, file_path)
-            print(f"Created default configuration file at {file_path}")
-            return default_config
-        
+            if write_default:
+                # Create default configuration file
+                with open(file_path, "w", encoding="utf-8") as f:
+                    f.write(ConfigManager._default_config_yaml())
+                print(f"Created default configuration file at {file_path}")
+            return ConfigManager.get_default_config()
+        
+        yaml, loader, _ = _import_yaml()
         try:
-            with open(file_path, "r") as f:
-                config_data = yaml.safe_load(f)
+            # Binary mode: the loader detects the encoding (UTF-8/16, BOM)
+            # itself, skipping Python's text decoding layer
+            with open(file_path, "rb") as f:
+                config_data = yaml.load(f, Loader=loader)
             
             if config_data is None:
                 config_data = {}
@@ -316,32 +426,53 @@ class ConfigManager:
         channel_configs = encryption_data.get("channels", [])
         channel_keys = {}
         for ch in channel_configs:
-            if isinstance(ch, dict) and "name" in ch:
-                channel_keys[ch["name"]] = ch.get("key", "")
+            # Entries without a name (or that aren't mappings) are skipped
+            try:
+                name = ch["name"]
+            except (TypeError, KeyError):
+                continue
+            channel_keys[_intern(name)] = ch.get("key", "")
+        
+        # Packet type names from the file are interned like the decoder's, so
+        # per-message lookups in the formatter's tables match by identity; the
+        # defaults' keys are literals and already interned
         
         # Parse display configuration
+        # Defaults are merged first so user entries override them; they are
+        # copied to lists to match user-supplied entries
         display_data = config_data.get("display", {})
-        display_fields = display_data.get("fields", {})
+        display_fields = {
+            packet_type: list(fields)
+            for packet_type, fields in _DEFAULT_DISPLAY_FIELDS.items()
+        }
+        display_fields.update(
+            (_intern(packet_type), fields)
+            for packet_type, fields in display_data.get("fields", {}).items()
+        )
         
         # Parse color configuration
         colors_data = config_data.get("colors", {})
-        packet_type_colors = colors_data.get("packet_types", {})
+        packet_type_colors = dict(_DEFAULT_PACKET_COLORS)
+        packet_type_colors.update(
+            (_intern(packet_type), color)
+            for packet_type, color in colors_data.get("packet_types", {}).items()
+        )
         
         # Parse keyword configuration
         keywords_data = colors_data.get("keywords", [])
         keywords = []
+        keyword_highlights = {}
         for kw in keywords_data:
-            if isinstance(kw, dict) and "keyword" in kw:
-                keywords.append(
-                    KeywordConfig(
-                        keyword=kw["keyword"],
-                        case_sensitive=kw.get("case_sensitive", False),
-                        color=kw.get("color", "white"),
-                    )
+            try:
+                keyword = KeywordConfig(
+                    keyword=kw["keyword"],
+                    case_sensitive=kw.get("case_sensitive", False),
+                    color=kw.get("color", "white"),
                 )
-        
-        # Build keyword highlights dict
-        keyword_highlights = {kw.keyword: kw.color for kw in keywords}
+            except (TypeError, KeyError):
+                continue
+            keywords.append(keyword)
+            keyword_highlights[keyword.keyword] = keyword.color
         
         color_config = ColorConfig(
             packet_type_colors=packet_type_colors,
@@ -349,7 +480,7 @@ class ConfigManager:
         )
         
         # Create and return MonitorConfig
-        config = MonitorConfig(
+        return MonitorConfig(
             mqtt=mqtt_config,
             topic=topic,
             channels=channels,
@@ -358,33 +489,25 @@ class ConfigManager:
             colors=color_config,
             keywords=keywords,
         )
-        
-        # Apply defaults for missing display fields
-        default_config = ConfigManager.get_default_config()
-        for packet_type, fields in default_config.display_fields.items():
-            if packet_type not in config.display_fields:
-                config.display_fields[packet_type] = fields
-        
-        # Apply defaults for missing colors
-        for packet_type, color in default_config.colors.packet_type_colors.items():
-            if packet_type not in config.colors.packet_type_colors:
-                config.colors.packet_type_colors[packet_type] = color
-        
-        return config
 
     @staticmethod
     def _save_config(config: MonitorConfig, file_path: str) -> None:
         """Save configuration to YAML file."""
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(ConfigManager._render_config(config))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _default_config_yaml() -> str:
+        """Render the default configuration once and reuse the YAML text."""
+        return ConfigManager._render_config(ConfigManager.get_default_config())
+
+    @staticmethod
+    def _render_config(config: MonitorConfig) -> str:
+        """Serialize configuration to YAML text."""
         config_dict = {
             "version": "1.0",
-            "mqtt": {
-                "host": config.mqtt.host,
-                "port": config.mqtt.port,
-                "username": config.mqtt.username,
-                "password": config.mqtt.password,
-                "use_tls": config.mqtt.use_tls,
-                "ca_cert": config.mqtt.ca_cert,
-            },
+            "mqtt": asdict(config.mqtt),
             "monitoring": {
                 "topic": config.topic,
                 "channels": config.channels,
@@ -396,23 +519,21 @@ class ConfigManager:
                 ]
             },
             "display": {
-                "fields": config.display_fields,
+                "fields": {
+                    packet_type: list(fields)
+                    for packet_type, fields in config.display_fields.items()
+                },
             },
             "colors": {
                 "packet_types": config.colors.packet_type_colors,
-                "keywords": [
-                    {
-                        "keyword": kw.keyword,
-                        "case_sensitive": kw.case_sensitive,
-                        "color": kw.color,
-                    }
-                    for kw in config.keywords
-                ],
+                "keywords": [asdict(kw) for kw in config.keywords],
             },
         }
         
-        with open(file_path, "w") as f:
-            yaml.dump(config_dict, f, default_flow_style=False, sort_keys=False)
+        yaml, _, dumper = _import_yaml()
+        return str(yaml.dump(
+            config_dict, Dumper=dumper, default_flow_style=False, sort_keys=False
+        ))
 
     @staticmethod
     def validate_config(config: MonitorConfig) -> bool:
@@ -460,45 +581,33 @@ class ConfigManager:
         Returns:
             Updated MonitorConfig with CLI overrides applied
         """
-        # Override MQTT settings
-        if hasattr(args, "host") and args.host:
-            config.mqtt.host = args.host
-        if hasattr(args, "port") and args.port:
-            config.mqtt.port = args.port
-        if hasattr(args, "username") and args.username:
-            config.mqtt.username = args.username
-        if hasattr(args, "password") and args.password:
-            config.mqtt.password = args.password
-        if hasattr(args, "use_tls") and args.use_tls:
-            config.mqtt.use_tls = args.use_tls
-        if hasattr(args, "ca_cert") and args.ca_cert:
-            config.mqtt.ca_cert = args.ca_cert
-        
-        # Override monitoring settings
-        if hasattr(args, "topic") and args.topic:
-            config.topic = args.topic
-        if hasattr(args, "channels") and args.channels:
-            config.channels = [ch.strip() for ch in args.channels.split(",")]
+        # Override MQTT and monitoring settings; argparse sets every
+        # declared option, so unset ones simply come back as None
+        for arg_name in _CLI_MQTT_OVERRIDES:
+            value = getattr(args, arg_name, None)
+            if value:
+                setattr(config.mqtt, arg_name, value)
+        for arg_name in _CLI_CONFIG_OVERRIDES:
+            value = getattr(args, arg_name, None)
+            if value:
+                setattr(config, arg_name, value)
+        
+        channels = getattr(args, "channels", None)
+        if channels:
+            config.channels = [ch.strip() for ch in channels.split(",")]
         
         # Override color settings for specific packet types
-        color_mappings = {
-            "color_position": "POSITION",
-            "color_text_message_app": "TEXT_MESSAGE_APP",
-            "color_telemetry_app": "TELEMETRY_APP",
-            "color_nodeinfo_app": "NODEINFO_APP",
-            "color_routing_app": "ROUTING_APP",
-            "color_admin_app": "ADMIN_APP",
-        }
-        
-        for arg_name, packet_type in color_mappings.items():
-            if hasattr(args, arg_name):
-                color_value = getattr(args, arg_name)
-                if color_value:
-                    config.colors.packet_type_colors[packet_type] = color_value
+        for arg_name, packet_type in _COLOR_ARG_MAPPINGS:
+            color_value = getattr(args, arg_name, None)
+            if color_value:
+                config.colors.packet_type_colors[packet_type] = color_value
         
         # Handle keyword highlighting from --highlight arguments
-        if hasattr(args, "highlight") and args.highlight:
-            for highlight_spec in args.highlight:
+        highlights = getattr(args, "highlight", None)
+        if highlights:
+            # Index existing keywords once so each spec is a dict lookup
+            keyword_index = {kw.keyword: kw for kw in config.keywords}
+            for highlight_spec in highlights:
                 # Parse format: keyword:color
                 if ":" in highlight_spec:
                     keyword, color = highlight_spec.split(":", 1)
@@ -508,25 +617,14 @@ class ConfigManager:
                     # Add to keyword highlights
                     config.colors.keyword_highlights[keyword] = color
                     
-                    # Add to keywords list if not already present
-                    if not any(kw.keyword == keyword for kw in config.keywords):
-                        config.keywords.append(
-                            KeywordConfig(keyword=keyword, case_sensitive=False, color=color)
-                        )
-                    else:
+                    existing = keyword_index.get(keyword)
+                    if existing is not None:
                         # Update existing keyword color
-                        for kw in config.keywords:
-                            if kw.keyword == keyword:
-                                kw.color = color
-                                break
-        
-        # Handle filter options
-        if hasattr(args, "filter_type") and args.filter_type:
-            config.filter_type = args.filter_type
-        if hasattr(args, "filter_text") and args.filter_text:
-            config.filter_text = args.filter_text
-        if hasattr(args, "hide_decode_errors") and args.hide_decode_errors:
-            config.hide_decode_errors = args.hide_decode_errors
+                        existing.color = color
+                    else:
+                        kw = KeywordConfig(keyword=keyword, case_sensitive=False, color=color)
+                        config.keywords.append(kw)
+                        keyword_index[keyword] = kw
         
         return config
 
@@ -1,35 +1,327 @@
 """Message decoder for Meshtastic MQTT Monitor."""
 
 import base64
+import functools
 import json
 import logging
+import operator
+import struct
+import sys
+import threading
+import time
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Dict, Optional
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional, Tuple
 
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
 from meshtastic import mesh_pb2, mqtt_pb2, portnums_pb2, telemetry_pb2
 
+from src.config import DATACLASS_OPTIONS
+
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+# Human-readable names for known port numbers
+_KNOWN_PORTNUM_NAMES = {
+    portnums_pb2.PortNum.UNKNOWN_APP: "UNKNOWN",
+    portnums_pb2.PortNum.TEXT_MESSAGE_APP: "TEXT_MESSAGE_APP",
+    portnums_pb2.PortNum.REMOTE_HARDWARE_APP: "REMOTE_HARDWARE_APP",
+    portnums_pb2.PortNum.POSITION_APP: "POSITION",
+    portnums_pb2.PortNum.NODEINFO_APP: "NODEINFO_APP",
+    portnums_pb2.PortNum.ROUTING_APP: "ROUTING_APP",
+    portnums_pb2.PortNum.ADMIN_APP: "ADMIN_APP",
+    portnums_pb2.PortNum.TEXT_MESSAGE_COMPRESSED_APP: "TEXT_MESSAGE_COMPRESSED",
+    portnums_pb2.PortNum.WAYPOINT_APP: "WAYPOINT_APP",
+    portnums_pb2.PortNum.AUDIO_APP: "AUDIO_APP",
+    portnums_pb2.PortNum.DETECTION_SENSOR_APP: "DETECTION_SENSOR_APP",
+    portnums_pb2.PortNum.REPLY_APP: "REPLY_APP",
+    portnums_pb2.PortNum.IP_TUNNEL_APP: "IP_TUNNEL_APP",
+    portnums_pb2.PortNum.PAXCOUNTER_APP: "PAXCOUNTER_APP",
+    portnums_pb2.PortNum.SERIAL_APP: "SERIAL_APP",
+    portnums_pb2.PortNum.STORE_FORWARD_APP: "STORE_FORWARD_APP",
+    portnums_pb2.PortNum.RANGE_TEST_APP: "RANGE_TEST_APP",
+    portnums_pb2.PortNum.TELEMETRY_APP: "TELEMETRY_APP",
+    portnums_pb2.PortNum.ZPS_APP: "ZPS_APP",
+    portnums_pb2.PortNum.SIMULATOR_APP: "SIMULATOR_APP",
+    portnums_pb2.PortNum.TRACEROUTE_APP: "TRACEROUTE_APP",
+    portnums_pb2.PortNum.NEIGHBORINFO_APP: "NEIGHBORINFO_APP",
+    portnums_pb2.PortNum.ATAK_PLUGIN: "ATAK_PLUGIN",
+    portnums_pb2.PortNum.MAP_REPORT_APP: "MAP_REPORT_APP",
+}
+
+# Port numbers with dedicated field extractors, bound once as plain ints
+_PN_TEXT = int(portnums_pb2.PortNum.TEXT_MESSAGE_APP)
+_PN_POSITION = int(portnums_pb2.PortNum.POSITION_APP)
+_PN_NODEINFO = int(portnums_pb2.PortNum.NODEINFO_APP)
+_PN_TELEMETRY = int(portnums_pb2.PortNum.TELEMETRY_APP)
+_PN_NEIGHBORINFO = int(portnums_pb2.PortNum.NEIGHBORINFO_APP)
+
+# Packet type name for every valid port number, indexed by portnum
+_PORTNUM_NAMES: Tuple[str, ...] = tuple(
+    sys.intern(_KNOWN_PORTNUM_NAMES.get(portnum, f"UNKNOWN_{portnum}"))
+    for portnum in range(max(portnums_pb2.PortNum.values()) + 1)
+)
+
+# Degrees per unit of the fixed-point latitude_i/longitude_i fields
+_COORD_SCALE = 1e-7
+
+# Scales a fixed-point coordinate to degrees without a Python-level frame
+_scale_coordinate = functools.partial(operator.mul, _COORD_SCALE)
+
+# (Position field, output field, converter) for position packets; zero
+# values are treated as unset.
+_POSITION_FIELDS: Tuple[Tuple[str, str, Optional[Callable[[Any], Any]]], ...] = (
+    ("latitude_i", "latitude", _scale_coordinate),
+    ("longitude_i", "longitude", _scale_coordinate),
+    ("altitude", "altitude", None),
+    ("time", "time", datetime.fromtimestamp),
+    ("precision_bits", "precision_bits", None),
+)
+
+# (metrics field, output field) pairs per Telemetry variant
+_TELEMETRY_FIELDS: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "device_metrics": (
+        ("battery_level", "battery_level"),
+        ("voltage", "voltage"),
+        ("channel_utilization", "channel_utilization"),
+        ("air_util_tx", "air_util_tx"),
+    ),
+    "environment_metrics": (
+        ("temperature", "temperature"),
+        ("relative_humidity", "humidity"),
+        ("barometric_pressure", "pressure"),
+    ),
+    "power_metrics": (
+        ("ch1_voltage", "ch1_voltage"),
+        ("ch1_current", "ch1_current"),
+    ),
+}
+
+# JSON message "type" values (lowercased) and the packet types they map to
+_JSON_TYPE_MAP: Mapping[str, str] = MappingProxyType({
+    "sendtext": "TEXT_MESSAGE_APP",
+    "text": "TEXT_MESSAGE_APP",
+    "position": "POSITION",
+    "nodeinfo": "NODEINFO_APP",
+    "telemetry": "TELEMETRY_APP",
+})
+
+# Top-level JSON keys copied into fields when the payload doesn't set them
+_JSON_EXTRA_KEYS = ("channel", "id", "sender", "timestamp")
+
+# MeshPacket's "from" field is a Python keyword, so it can't be read as an
+# attribute directly; attrgetter binds the name once
+_FROM_GETTER = operator.attrgetter("from")
+
+# Meshtastic's default channel PSK; one-byte keys ("AQ==" etc.) select it
+# with the last byte offset by the key index
+_DEFAULT_PSK = bytes.fromhex("d4f1bb3a20290759f0bcffabcf4e6901")
+
+# AES key sizes Meshtastic uses (AES-128 and AES-256)
+_AES_KEY_SIZES = (16, 32)
+
+# AES-CTR nonce layout: packet ID (uint64 LE), sender (uint32 LE), zero pad
+_NONCE_STRUCT = struct.Struct("<QII")
+
+# Messages decoded within this window share a timestamp
+_TIMESTAMP_RESOLUTION_NS = 1_000_000
+
+# First byte of a ServiceEnvelope whose `packet` (field 1, wire type 2) is set
+_ENVELOPE_PACKET_TAG = 0x0A
+
+
+def _decode_channel_key(key_b64: str) -> bytes:
+    """
+    Decode a base64 channel key, tolerating missing "=" padding.
+    
+    Args:
+        key_b64: Base64 encoded key as written in the configuration
+        
+    Returns:
+        Decoded key bytes
+        
+    Raises:
+        binascii.Error: If the key isn't valid base64
+    """
+    key_b64 = key_b64.strip()
+    return base64.b64decode(key_b64 + "=" * (-len(key_b64) % 4), validate=True)
+
+
+def _expand_channel_key(raw_key: bytes) -> Optional[bytes]:
+    """
+    Expand a channel PSK to a full AES key the way Meshtastic firmware does.
+    
+    Args:
+        raw_key: Decoded channel key bytes
+        
+    Returns:
+        16 or 32 byte AES key, or None if the channel is unencrypted or the
+        key is too long to use
+    """
+    if len(raw_key) == 1:
+        # Index 0 means no encryption, 1..255 pick a variant of the default key
+        index = raw_key[0]
+        if index == 0:
+            return None
+        return _DEFAULT_PSK[:-1] + bytes(((_DEFAULT_PSK[-1] + index - 1) & 0xFF,))
+    
+    for size in _AES_KEY_SIZES:
+        if 0 < len(raw_key) <= size:
+            # Short keys are zero-padded to the next AES key size
+            return raw_key.ljust(size, b"\x00")
+    return None
+
+
+def _protobuf_implementation() -> str:
+    """Return the active protobuf runtime ("upb", "cpp" or "python")."""
+    try:
+        from google.protobuf.internal import api_implementation
+    except ImportError:
+        return "unknown"
+    return str(api_implementation.Type())
+
+
+@functools.lru_cache(maxsize=4096)
+def _node_id_string(node_id: int) -> str:
+    """Format a node number as "!xxxxxxxx"; a few nodes dominate traffic."""
+    return f"!{node_id:08x}"
+
+
+@functools.lru_cache(maxsize=1024)
+def _channel_from_topic(topic: str) -> str:
+    """Extract channel name from MQTT topic (see MessageDecoder._extract_channel_from_topic)."""
+    # Interned so channel key lookups match the interned config names by identity
+    return sys.intern(_parse_topic_channel(topic))
+
+
+def _parse_topic_channel(topic: str) -> str:
+    """Find the channel name segment of an MQTT topic."""
+    parts = topic.split("/")
+    
+    # Topic formats:
+    # msh/REGION/CHANNEL_NUM/TYPE/CHANNEL_NAME[/extra/path] (5+ parts)
+    # msh/REGION/AREA/NETWORK/CHANNEL_NUM/TYPE/CHANNEL_NAME[/extra/path] (7+ parts)
+    
+    # Find the type indicator (e, c, json, stat, map) and get the next part
+    for i, part in enumerate(parts):
+        if part in ['e', 'c', 'json', 'stat']:
+            # Channel name is the part right after the type
+            if i + 1 < len(parts):
+                return parts[i + 1]
+            break
+        elif part == 'map':
+            # For map reports, if there's a part after 'map', use it
+            # Otherwise, look for the channel name before the channel number
+            if i + 1 < len(parts):
+                return parts[i + 1]
+            # Try to find channel name before the number (e.g., msh/US/FL/thevillages/2/map)
+            # The pattern is usually: msh/REGION/AREA/NETWORK/NUM/map
+            # So we want the NETWORK part (parts[3] in this case)
+            if i >= 2 and parts[i-1].isdigit():
+                # The part before the number might be the network/channel name
+                if i >= 3:
+                    return parts[i-2]  # Get the part before the channel number
+            return "map"  # Fallback to "map" as the channel name
+    
+    # Fallback: try to get a reasonable channel identifier
+    if len(parts) >= 5:
+        return parts[4]
+    
+    return "unknown"
+
+
+class LazyFields(Mapping):
+    """
+    Read-only mapping of message fields, extracted on first access.
+    
+    Parsing a payload is deferred until a consumer actually reads a field,
+    so messages dropped by a packet-type filter never pay for it. Use
+    dict(fields) to get a plain, mutable copy, e.g. for json.dumps; pickling
+    also produces a plain dict.
+    """
+
+    __slots__ = ("_extract", "_args", "_fields")
+
+    def __init__(self, extract: Callable[..., Dict[str, Any]], *args: Any):
+        """
+        Initialize lazy fields.
+        
+        Args:
+            extract: Callable returning the fields dictionary
+            *args: Arguments passed to extract on first access
+        """
+        self._extract = extract
+        self._args = args
+        self._fields: Optional[Dict[str, Any]] = None
+
+    def _materialize(self) -> Dict[str, Any]:
+        fields = self._fields
+        if fields is None:
+            fields = self._fields = self._extract(*self._args)
+        return fields
+
+    def __getitem__(self, key: str) -> Any:
+        return self._materialize()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._materialize())
+
+    def __len__(self) -> int:
+        return len(self._materialize())
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._materialize()
+
+    def __repr__(self) -> str:
+        return f"LazyFields({self._materialize()!r})"
+
+    def __reduce__(self):
+        # Pickle (and copy) as a plain dict rather than the bound extractor,
+        # which references the decoder's thread-local message pool
+        return dict, (self._materialize(),)
+
+
+@dataclass(**DATACLASS_OPTIONS)
 class DecodedMessage:
-    """Represents a decoded Meshtastic message."""
+    """
+    Represents a decoded Meshtastic message.
+    
+    fields is read-only on every path: a LazyFields for protobuf packets and
+    a plain dict for JSON, status and error messages, which consumers must
+    not modify either. Copy it with dict(fields) to change it.
+    """
 
     packet_type: str
     channel: str
     from_node: str
     to_node: str
     timestamp: datetime
-    fields: Dict[str, Any] = field(default_factory=dict)
+    fields: Mapping[str, Any] = field(default_factory=dict)
     raw_data: bytes = b""
     decryption_success: bool = True
     error: Optional[str] = None
 
 
+class _MessagePool(threading.local):
+    """
+    Per-thread protobuf messages reused across decodes.
+    
+    Each message is overwritten by the next ParseFromString, so values must
+    be copied out before the next decode on the same thread.
+    """
+
+    def __init__(self):
+        self.envelope = mqtt_pb2.ServiceEnvelope()
+        self.packet = mesh_pb2.MeshPacket()
+        self.data = mesh_pb2.Data()
+        self.position = mesh_pb2.Position()
+        self.telemetry = telemetry_pb2.Telemetry()
+        self.user = mesh_pb2.User()
+        self.neighbor_info = mesh_pb2.NeighborInfo()
+
+
 class MessageDecoder:
     """
     Decodes and decrypts Meshtastic protobuf messages.
@@ -47,15 +339,52 @@ class MessageDecoder:
         """
         self.channel_keys = channel_keys
         self._decoded_keys: Dict[str, bytes] = {}
+        self._aes_algorithms: Dict[str, algorithms.AES] = {}
+        self._messages = _MessagePool()
+        self._now_ns = time.monotonic_ns()
+        self._now_dt = datetime.now()
+        
+        if _protobuf_implementation() == "python":
+            logger.warning(
+                "protobuf is using its pure-Python runtime; decoding will be "
+                "several times slower. Install a protobuf wheel with the upb "
+                "backend and unset PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION."
+            )
         
-        # Decode and cache encryption keys
+        # Decode and cache encryption keys, expanded to full AES keys so the
+        # per-packet path only has to build the cipher
         for channel_name, key_b64 in channel_keys.items():
+            if not key_b64:
+                continue  # No key: the channel is unencrypted
+            
             try:
-                decoded_key = base64.b64decode(key_b64)
-                self._decoded_keys[channel_name] = decoded_key
-                logger.debug(f"Loaded encryption key for channel: {channel_name}")
+                decoded_key = _decode_channel_key(key_b64)
             except Exception as e:
-                logger.warning(f"Invalid base64 key for channel {channel_name}: {e}")
+                logger.warning("Invalid base64 key for channel %s: %s", channel_name, e)
+                continue
+            
+            aes_key = _expand_channel_key(decoded_key)
+            if aes_key is None:
+                if decoded_key not in (b"", b"\x00"):
+                    logger.warning(
+                        "Unusable %s byte key for channel %s", len(decoded_key), channel_name
+                    )
+                continue
+            
+            channel_name = sys.intern(channel_name)
+            self._decoded_keys[channel_name] = aes_key
+            self._aes_algorithms[channel_name] = algorithms.AES(aes_key)
+            logger.debug("Loaded encryption key for channel: %s", channel_name)
+        
+        # Field extractors keyed by portnum; anything else falls back to
+        # _extract_unknown_fields
+        self._field_extractors: Dict[int, Callable[[bytes], Dict[str, Any]]] = {
+            _PN_POSITION: self._extract_position_fields,
+            _PN_TEXT: self._extract_text_message_fields,
+            _PN_TELEMETRY: self._extract_telemetry_fields,
+            _PN_NODEINFO: self._extract_nodeinfo_fields,
+            _PN_NEIGHBORINFO: self._extract_neighborinfo_fields,
+        }
 
     def decode(self, mqtt_topic: str, payload: bytes) -> DecodedMessage:
         """
@@ -68,18 +397,23 @@ class MessageDecoder:
         Returns:
             DecodedMessage object with decoded information
         """
+        timestamp = self._now()
+        
+        # Extract channel from topic (e.g., "msh/US/2/e/LongFast" -> "LongFast")
+        channel = self._extract_channel_from_topic(mqtt_topic)
+        
         try:
             # Check if this is a status message (plain text on /stat/ topic)
             if "/stat/" in mqtt_topic:
                 try:
                     status_text = payload.decode('utf-8', errors='ignore')
-                    logger.debug(f"Status message on topic {mqtt_topic}: {status_text}")
+                    logger.debug("Status message on topic %s: %s", mqtt_topic, status_text)
                     return DecodedMessage(
                         packet_type="STATUS",
-                        channel=self._extract_channel_from_topic(mqtt_topic),
+                        channel=channel,
                         from_node=mqtt_topic.split("/")[-1] if "/" in mqtt_topic else "unknown",
                         to_node="broadcast",
-                        timestamp=datetime.now(),
+                        timestamp=timestamp,
                         fields={"status": status_text},
                         raw_data=payload,
                         decryption_success=True,
@@ -88,23 +422,18 @@ class MessageDecoder:
                     pass  # If decode fails, continue to protobuf parsing
             
             # Check if payload is JSON (some MQTT messages are JSON, not protobuf)
-            if payload.startswith(b'{') or payload.startswith(b'['):
+            first_byte = payload[0] if payload else 0
+            if first_byte == 0x7B or first_byte == 0x5B:  # '{' or '['
                 try:
-                    json_data = json.loads(payload.decode('utf-8'))
-                    logger.debug(f"Parsing JSON message on topic {mqtt_topic}")
+                    # json.loads accepts bytes and detects the UTF encoding itself
+                    json_data = json.loads(payload)
+                    logger.debug("Parsing JSON message on topic %s", mqtt_topic)
                     
                     # Extract common fields from JSON
                     raw_type = json_data.get('type', 'UNKNOWN')
                     
                     # Normalize JSON message types to standard packet types
-                    type_mapping = {
-                        'sendtext': 'TEXT_MESSAGE_APP',
-                        'text': 'TEXT_MESSAGE_APP',
-                        'position': 'POSITION',
-                        'nodeinfo': 'NODEINFO_APP',
-                        'telemetry': 'TELEMETRY_APP',
-                    }
-                    packet_type = type_mapping.get(raw_type.lower(), raw_type)
+                    packet_type = _JSON_TYPE_MAP.get(raw_type.lower(), raw_type)
                     
                     from_node = json_data.get('from', 'unknown')
                     to_node = json_data.get('to', 'unknown')
@@ -125,63 +454,71 @@ class MessageDecoder:
                             fields = {'payload': payload_data}
                     
                     # Add other top-level fields
-                    for key in ['channel', 'id', 'sender', 'timestamp']:
-                        if key in json_data and key not in fields:
-                            fields[key] = json_data[key]
+                    fields.update(
+                        (key, json_data[key])
+                        for key in _JSON_EXTRA_KEYS
+                        if key in json_data and key not in fields
+                    )
                     
                     return DecodedMessage(
                         packet_type=packet_type,
-                        channel=self._extract_channel_from_topic(mqtt_topic),
+                        channel=channel,
                         from_node=from_node,
                         to_node=to_node,
-                        timestamp=datetime.now(),
+                        timestamp=timestamp,
                         fields=fields,
                         raw_data=payload,
                         decryption_success=True,
                     )
                 except json.JSONDecodeError as e:
-                    logger.warning(f"Failed to parse JSON message: {e}")
+                    logger.warning("Failed to parse JSON message: %s", e)
                     return DecodedMessage(
                         packet_type="JSON_ERROR",
-                        channel=self._extract_channel_from_topic(mqtt_topic),
+                        channel=channel,
                         from_node="unknown",
                         to_node="unknown",
-                        timestamp=datetime.now(),
+                        timestamp=timestamp,
                         fields={"error": f"Invalid JSON: {e}"},
                         raw_data=payload,
                         decryption_success=False,
                     )
             
-            # Try to parse as ServiceEnvelope first
-            envelope = mqtt_pb2.ServiceEnvelope()
+            # Try to parse as ServiceEnvelope first. Messages come from a
+            # per-thread pool; ParseFromString clears them before parsing
+            messages = self._messages
             mesh_packet = None
             
-            try:
-                bytes_parsed = envelope.ParseFromString(payload)
-                logger.debug(f"Successfully parsed {bytes_parsed} bytes as ServiceEnvelope")
-                # Check if envelope has a packet
-                if envelope.HasField("packet"):
-                    mesh_packet = envelope.packet
-                else:
-                    logger.debug("ServiceEnvelope has no packet field, trying direct MeshPacket parse")
-            except Exception as parse_error:
-                logger.debug(f"Failed to parse as ServiceEnvelope: {parse_error}, trying direct MeshPacket")
+            # A serialized ServiceEnvelope with a packet starts with the
+            # packet field tag (field 1, length-delimited). MeshPacket has no
+            # length-delimited field 1, so anything else goes straight to
+            # the MeshPacket parse below.
+            if first_byte == _ENVELOPE_PACKET_TAG:
+                envelope = messages.envelope
+                try:
+                    bytes_parsed = envelope.ParseFromString(payload)
+                    logger.debug("Successfully parsed %s bytes as ServiceEnvelope", bytes_parsed)
+                    # Check if envelope has a packet
+                    if envelope.HasField("packet"):
+                        mesh_packet = envelope.packet
+                    else:
+                        logger.debug("ServiceEnvelope has no packet field, trying direct MeshPacket parse")
+                except Exception as parse_error:
+                    logger.debug("Failed to parse as ServiceEnvelope: %s, trying direct MeshPacket", parse_error)
             
             # If ServiceEnvelope didn't work, try parsing directly as MeshPacket
             if mesh_packet is None:
                 try:
-                    mesh_packet = mesh_pb2.MeshPacket()
+                    mesh_packet = messages.packet
                     mesh_packet.ParseFromString(payload)
                     logger.debug("Successfully parsed as direct MeshPacket")
                 except Exception as packet_error:
-                    logger.error(f"Failed to parse as both ServiceEnvelope and MeshPacket")
-                    logger.error(f"Topic: {mqtt_topic}")
-                    logger.error(f"Payload length: {len(payload)} bytes")
-                    logger.error(f"Payload (first 100 bytes hex): {payload[:min(100, len(payload))].hex()}")
+                    logger.error("Failed to parse as both ServiceEnvelope and MeshPacket")
+                    logger.error("Topic: %s", mqtt_topic)
+                    logger.error("Payload length: %s bytes", len(payload))
+                    logger.error("Payload (first 100 bytes hex): %s", payload[:100].hex())
                     raise ValueError(f"Could not parse message as ServiceEnvelope or MeshPacket: {packet_error}")
             
-            # Extract channel from topic (e.g., "msh/US/2/e/LongFast" -> "LongFast")
-            channel = self._extract_channel_from_topic(mqtt_topic)
+            from_num = _FROM_GETTER(mesh_packet)
             
             # Determine if we need to decrypt
             data_msg = None
@@ -191,19 +528,22 @@ class MessageDecoder:
                 # Already decoded (unencrypted)
                 data_msg = mesh_packet.decoded
             elif len(mesh_packet.encrypted) > 0:
-                # Encrypted - attempt to decrypt
-                if channel in self._decoded_keys:
-                    try:
-                        decrypted_bytes = self._decrypt_payload(mesh_packet.encrypted, channel)
-                        if decrypted_bytes:
-                            data_msg = mesh_pb2.Data()
-                            data_msg.ParseFromString(decrypted_bytes)
-                        else:
-                            decryption_success = False
-                    except Exception as e:
-                        logger.debug(f"Decryption failed for channel {channel}: {e}")
+                # Encrypted - attempt to decrypt (None when the channel has
+                # no key or decryption fails)
+                try:
+                    decrypted_bytes = self._decrypt_payload(
+                        mesh_packet.encrypted,
+                        channel,
+                        mesh_packet.id,
+                        from_num,
+                    )
+                    if decrypted_bytes:
+                        data_msg = messages.data
+                        data_msg.ParseFromString(decrypted_bytes)
+                    else:
                         decryption_success = False
-                else:
+                except Exception as e:
+                    logger.debug("Decryption failed for channel %s: %s", channel, e)
                     decryption_success = False
             
             # If we couldn't get data_msg, return error
@@ -211,9 +551,9 @@ class MessageDecoder:
                 return DecodedMessage(
                     packet_type="ENCRYPTED" if not decryption_success else "UNKNOWN",
                     channel=channel,
-                    from_node=self._format_node_id(getattr(mesh_packet, 'from')),
+                    from_node=self._format_node_id(from_num),
                     to_node=self._format_node_id(mesh_packet.to),
-                    timestamp=datetime.now(),
+                    timestamp=timestamp,
                     fields={"status": "Unable to decrypt or decode"},
                     raw_data=payload,
                     decryption_success=False,
@@ -222,8 +562,11 @@ class MessageDecoder:
             # Identify packet type
             packet_type = self._identify_packet_type(data_msg)
             
-            # Extract fields based on packet type
-            fields = self._extract_fields(data_msg, packet_type)
+            # Extract fields based on packet type, deferred until first read.
+            # The payload is copied out because data_msg is reused.
+            lazy_fields = LazyFields(
+                self._extract_payload_fields, data_msg.portnum, data_msg.payload, packet_type
+            )
             
             # Don't add channel to fields since it's already shown in basic info
             # This avoids duplication in the output
@@ -232,91 +575,143 @@ class MessageDecoder:
             return DecodedMessage(
                 packet_type=packet_type,
                 channel=channel,
-                from_node=self._format_node_id(getattr(mesh_packet, 'from')),
+                from_node=self._format_node_id(from_num),
                 to_node=self._format_node_id(mesh_packet.to),
-                timestamp=datetime.now(),
-                fields=fields,
+                timestamp=timestamp,
+                fields=lazy_fields,
                 raw_data=payload,
                 decryption_success=decryption_success,
             )
             
         except ValueError as e:
             # Specific parsing error with more context
-            logger.warning(f"Message parsing error: {e}")
+            logger.warning("Message parsing error: %s", e)
             return DecodedMessage(
                 packet_type="DECODE_ERROR",
-                channel=self._extract_channel_from_topic(mqtt_topic),
+                channel=channel,
                 from_node="unknown",
                 to_node="unknown",
-                timestamp=datetime.now(),
+                timestamp=timestamp,
                 fields={"error": str(e)},
                 raw_data=payload,
                 decryption_success=False,
                 error=str(e),
             )
         except Exception as e:
-            logger.error(f"Unexpected error decoding message: {e}", exc_info=True)
+            logger.error("Unexpected error decoding message: %s", e, exc_info=True)
             return DecodedMessage(
                 packet_type="DECODE_ERROR",
-                channel=self._extract_channel_from_topic(mqtt_topic),
+                channel=channel,
                 from_node="unknown",
                 to_node="unknown",
-                timestamp=datetime.now(),
+                timestamp=timestamp,
                 fields={"error": f"Unexpected error: {str(e)}"},
                 raw_data=payload,
                 decryption_success=False,
                 error=str(e),
             )
 
-    def _decrypt_payload(self, encrypted_data: bytes, channel: str) -> Optional[bytes]:
+    def peek_packet_type(self, mqtt_topic: str, payload: bytes) -> Optional[str]:
+        """
+        Determine a message's packet type without fully decoding it.
+        
+        Only the outer protobuf layers are parsed: nothing is decrypted and
+        no fields are extracted. Used to drop messages a packet type filter
+        would reject before paying for a full decode.
+        
+        Args:
+            mqtt_topic: MQTT topic the message was received on
+            payload: Raw message payload bytes
+            
+        Returns:
+            The packet type decode() would report, or None if it can't be
+            known without a full decode (JSON, decryptable or unparseable
+            payloads)
+        """
+        if "/stat/" in mqtt_topic:
+            return "STATUS"
+        
+        first_byte = payload[0] if payload else 0
+        if first_byte == 0x7B or first_byte == 0x5B:  # '{' or '['
+            return None
+        
+        messages = self._messages
+        mesh_packet = None
+        try:
+            if first_byte == _ENVELOPE_PACKET_TAG:
+                envelope = messages.envelope
+                envelope.ParseFromString(payload)
+                if envelope.HasField("packet"):
+                    mesh_packet = envelope.packet
+            if mesh_packet is None:
+                mesh_packet = messages.packet
+                mesh_packet.ParseFromString(payload)
+        except Exception:
+            return None
+        
+        if mesh_packet.HasField("decoded"):
+            return self._identify_packet_type(mesh_packet.decoded)
+        if not mesh_packet.encrypted:
+            return "UNKNOWN"
+        if self._extract_channel_from_topic(mqtt_topic) not in self._decoded_keys:
+            return "ENCRYPTED"
+        return None
+
+    def _now(self) -> datetime:
+        """
+        Get the receive timestamp for a decoded message.
+        
+        Bursts of messages share one datetime; the wall clock is re-read at
+        most once per _TIMESTAMP_RESOLUTION_NS of monotonic time.
+        
+        Returns:
+            Current local time, accurate to about a millisecond
+        """
+        now_ns = time.monotonic_ns()
+        if now_ns - self._now_ns >= _TIMESTAMP_RESOLUTION_NS:
+            self._now_dt = datetime.now()
+            self._now_ns = now_ns
+        return self._now_dt
+
+    def _decrypt_payload(
+        self, encrypted: bytes, channel: str, packet_id: int, from_node: int
+    ) -> Optional[bytes]:
         """
         Decrypt message payload using channel-specific key.
         
-        Uses AES-128-CTR cipher with nonce from packet header.
+        Uses AES-CTR with the Meshtastic nonce: the packet ID as a
+        little-endian uint64, followed by the sending node number as a
+        little-endian uint32 and four zero bytes. The whole payload is
+        ciphertext.
         
         Args:
-            encrypted_data: Encrypted payload bytes
+            encrypted: Encrypted payload bytes
             channel: Channel name to get decryption key
+            packet_id: MeshPacket id
+            from_node: MeshPacket sender node number
             
         Returns:
             Decrypted payload bytes, or None if decryption fails
         """
-        if channel not in self._decoded_keys:
-            logger.debug(f"No decryption key available for channel: {channel}")
+        # The AES algorithm object (key validated) is built once per channel
+        algorithm = self._aes_algorithms.get(channel)
+        if algorithm is None:
+            logger.debug("No decryption key available for channel: %s", channel)
             return None
         
-        key = self._decoded_keys[channel]
-        
         try:
-            # Meshtastic uses AES-128-CTR
-            # The nonce is derived from packet ID and other metadata
-            # For simplicity, we'll try to decrypt assuming standard format
-            
-            # Extract nonce (first 16 bytes) and ciphertext
-            if len(encrypted_data) < 16:
+            if not encrypted:
                 return None
             
-            nonce = encrypted_data[:8]
-            # Pad nonce to 16 bytes for CTR mode
-            nonce_padded = nonce + b'\x00' * 8
-            
-            ciphertext = encrypted_data[8:]
-            
-            # Create cipher
-            cipher = Cipher(
-                algorithms.AES(key),
-                modes.CTR(nonce_padded),
-                backend=default_backend()
-            )
-            decryptor = cipher.decryptor()
-            
-            # Decrypt
-            plaintext = decryptor.update(ciphertext) + decryptor.finalize()
+            nonce = _NONCE_STRUCT.pack(packet_id, from_node, 0)
             
-            return plaintext
+            # CTR is a stream mode: update() returns the whole plaintext and
+            # finalize() never yields further bytes, so it is skipped
+            decryptor = Cipher(algorithm, modes.CTR(nonce)).decryptor()
+            return decryptor.update(encrypted)
             
         except Exception as e:
-            logger.debug(f"Decryption error: {e}")
+            logger.debug("Decryption error: %s", e)
             return None
 
     def _extract_channel_from_topic(self, topic: str) -> str:
@@ -329,38 +724,9 @@ class MessageDecoder:
         Returns:
             Channel name, or channel number if name not found
         """
-        parts = topic.split("/")
-        
-        # Topic formats:
-        # msh/REGION/CHANNEL_NUM/TYPE/CHANNEL_NAME[/extra/path] (5+ parts)
-        # msh/REGION/AREA/NETWORK/CHANNEL_NUM/TYPE/CHANNEL_NAME[/extra/path] (7+ parts)
-        
-        # Find the type indicator (e, c, json, stat, map) and get the next part
-        for i, part in enumerate(parts):
-            if part in ['e', 'c', 'json', 'stat']:
-                # Channel name is the part right after the type
-                if i + 1 < len(parts):
-                    return parts[i + 1]
-                break
-            elif part == 'map':
-                # For map reports, if there's a part after 'map', use it
-                # Otherwise, look for the channel name before the channel number
-                if i + 1 < len(parts):
-                    return parts[i + 1]
-                # Try to find channel name before the number (e.g., msh/US/FL/thevillages/2/map)
-                # The pattern is usually: msh/REGION/AREA/NETWORK/NUM/map
-                # So we want the NETWORK part (parts[3] in this case)
-                if i >= 2 and parts[i-1].isdigit():
-                    # The part before the number might be the network/channel name
-                    if i >= 3:
-                        return parts[i-2]  # Get the part before the channel number
-                return "map"  # Fallback to "map" as the channel name
-        
-        # Fallback: try to get a reasonable channel identifier
-        if len(parts) >= 5:
-            return parts[4]
-        
-        return "unknown"
+        # Topics repeat heavily (a handful of channels, one suffix per node),
+        # so the parse is memoised at module level
+        return _channel_from_topic(topic)
 
     def _identify_packet_type(self, data_msg: mesh_pb2.Data) -> str:
         """
@@ -372,45 +738,21 @@ class MessageDecoder:
         Returns:
             String representation of packet type
         """
-        portnum = data_msg.portnum
-        
-        # Map portnum to human-readable names
-        portnum_names = {
-            portnums_pb2.PortNum.UNKNOWN_APP: "UNKNOWN",
-            portnums_pb2.PortNum.TEXT_MESSAGE_APP: "TEXT_MESSAGE_APP",
-            portnums_pb2.PortNum.REMOTE_HARDWARE_APP: "REMOTE_HARDWARE_APP",
-            portnums_pb2.PortNum.POSITION_APP: "POSITION",
-            portnums_pb2.PortNum.NODEINFO_APP: "NODEINFO_APP",
-            portnums_pb2.PortNum.ROUTING_APP: "ROUTING_APP",
-            portnums_pb2.PortNum.ADMIN_APP: "ADMIN_APP",
-            portnums_pb2.PortNum.TEXT_MESSAGE_COMPRESSED_APP: "TEXT_MESSAGE_COMPRESSED",
-            portnums_pb2.PortNum.WAYPOINT_APP: "WAYPOINT_APP",
-            portnums_pb2.PortNum.AUDIO_APP: "AUDIO_APP",
-            portnums_pb2.PortNum.DETECTION_SENSOR_APP: "DETECTION_SENSOR_APP",
-            portnums_pb2.PortNum.REPLY_APP: "REPLY_APP",
-            portnums_pb2.PortNum.IP_TUNNEL_APP: "IP_TUNNEL_APP",
-            portnums_pb2.PortNum.PAXCOUNTER_APP: "PAXCOUNTER_APP",
-            portnums_pb2.PortNum.SERIAL_APP: "SERIAL_APP",
-            portnums_pb2.PortNum.STORE_FORWARD_APP: "STORE_FORWARD_APP",
-            portnums_pb2.PortNum.RANGE_TEST_APP: "RANGE_TEST_APP",
-            portnums_pb2.PortNum.TELEMETRY_APP: "TELEMETRY_APP",
-            portnums_pb2.PortNum.ZPS_APP: "ZPS_APP",
-            portnums_pb2.PortNum.SIMULATOR_APP: "SIMULATOR_APP",
-            portnums_pb2.PortNum.TRACEROUTE_APP: "TRACEROUTE_APP",
-            portnums_pb2.PortNum.NEIGHBORINFO_APP: "NEIGHBORINFO_APP",
-            portnums_pb2.PortNum.ATAK_PLUGIN: "ATAK_PLUGIN",
-            portnums_pb2.PortNum.MAP_REPORT_APP: "MAP_REPORT_APP",
-        }
-        
-        return portnum_names.get(portnum, f"UNKNOWN_{portnum}")
+        portnum: int = data_msg.portnum
+        if 0 <= portnum < len(_PORTNUM_NAMES):
+            return _PORTNUM_NAMES[portnum]
+        return f"UNKNOWN_{portnum}"
 
-    def _extract_fields(self, data_msg: mesh_pb2.Data, packet_type: str) -> Dict[str, Any]:
+    def _extract_payload_fields(
+        self, portnum: int, payload: bytes, packet_type: str
+    ) -> Dict[str, Any]:
         """
-        Extract fields from message based on packet type.
+        Extract fields from a Data payload using the parser for its portnum.
         
         Args:
-            data_msg: Decoded Data protobuf message
-            packet_type: Identified packet type
+            portnum: Data message portnum
+            payload: Data message payload bytes
+            packet_type: Identified packet type (used for error reporting)
             
         Returns:
             Dictionary of extracted fields
@@ -418,55 +760,40 @@ class MessageDecoder:
         fields = {}
         
         try:
-            payload = data_msg.payload
-            
-            if packet_type == "POSITION":
-                fields = self._extract_position_fields(payload)
-            elif packet_type == "TEXT_MESSAGE_APP":
-                fields = self._extract_text_message_fields(payload)
-            elif packet_type == "TELEMETRY_APP":
-                fields = self._extract_telemetry_fields(payload)
-            elif packet_type == "NODEINFO_APP":
-                fields = self._extract_nodeinfo_fields(payload)
-            elif packet_type == "NEIGHBORINFO_APP":
-                fields = self._extract_neighborinfo_fields(payload)
-            else:
-                # For unknown types, just show raw payload info
-                fields["payload_size"] = len(payload)
-                if len(payload) > 0 and len(payload) < 100:
-                    try:
-                        fields["payload_text"] = payload.decode("utf-8", errors="ignore")
-                    except:
-                        fields["payload_hex"] = payload.hex()[:100]
+            extractor = self._field_extractors.get(portnum, self._extract_unknown_fields)
+            fields = extractor(payload)
         
         except Exception as e:
-            logger.debug(f"Error extracting fields for {packet_type}: {e}")
+            logger.debug("Error extracting fields for %s: %s", packet_type, e)
             fields["extraction_error"] = str(e)
         
         return fields
 
+    def _extract_unknown_fields(self, payload: bytes) -> Dict[str, Any]:
+        """Extract raw payload info for packet types without a dedicated parser."""
+        fields = {"payload_size": len(payload)}
+        if len(payload) > 0 and len(payload) < 100:
+            try:
+                fields["payload_text"] = payload.decode("utf-8", errors="ignore")
+            except:
+                fields["payload_hex"] = payload[:50].hex()
+        return fields
+
     def _extract_position_fields(self, payload: bytes) -> Dict[str, Any]:
         """Extract fields from POSITION packet."""
         fields = {}
         
         try:
-            position = mesh_pb2.Position()
+            position = self._messages.position
             position.ParseFromString(payload)
             
-            # Convert fixed-point integers to floats
-            if position.latitude_i != 0:
-                fields["latitude"] = position.latitude_i * 1e-7
-            if position.longitude_i != 0:
-                fields["longitude"] = position.longitude_i * 1e-7
-            if position.altitude != 0:
-                fields["altitude"] = position.altitude
-            if position.time != 0:
-                fields["time"] = datetime.fromtimestamp(position.time)
-            if position.precision_bits != 0:
-                fields["precision_bits"] = position.precision_bits
+            for proto_name, field_name, convert in _POSITION_FIELDS:
+                value = getattr(position, proto_name)
+                if value != 0:
+                    fields[field_name] = convert(value) if convert else value
                 
         except Exception as e:
-            logger.debug(f"Error parsing position: {e}")
+            logger.debug("Error parsing position: %s", e)
             fields["parse_error"] = str(e)
         
         return fields
@@ -480,7 +807,7 @@ class MessageDecoder:
             text = payload.decode("utf-8", errors="replace")
             fields["text"] = text
         except Exception as e:
-            logger.debug(f"Error parsing text message: {e}")
+            logger.debug("Error parsing text message: %s", e)
             fields["parse_error"] = str(e)
         
         return fields
@@ -490,39 +817,21 @@ class MessageDecoder:
         fields = {}
         
         try:
-            telemetry = telemetry_pb2.Telemetry()
+            telemetry = self._messages.telemetry
             telemetry.ParseFromString(payload)
             
-            # Check which telemetry variant is present
-            if telemetry.HasField("device_metrics"):
-                metrics = telemetry.device_metrics
-                if metrics.battery_level != 0:
-                    fields["battery_level"] = metrics.battery_level
-                if metrics.voltage != 0:
-                    fields["voltage"] = metrics.voltage
-                if metrics.channel_utilization != 0:
-                    fields["channel_utilization"] = metrics.channel_utilization
-                if metrics.air_util_tx != 0:
-                    fields["air_util_tx"] = metrics.air_util_tx
-            
-            if telemetry.HasField("environment_metrics"):
-                env = telemetry.environment_metrics
-                if env.temperature != 0:
-                    fields["temperature"] = env.temperature
-                if env.relative_humidity != 0:
-                    fields["humidity"] = env.relative_humidity
-                if env.barometric_pressure != 0:
-                    fields["pressure"] = env.barometric_pressure
-            
-            if telemetry.HasField("power_metrics"):
-                power = telemetry.power_metrics
-                if power.ch1_voltage != 0:
-                    fields["ch1_voltage"] = power.ch1_voltage
-                if power.ch1_current != 0:
-                    fields["ch1_current"] = power.ch1_current
+            # Variants are a oneof, so at most one is present
+            variant = telemetry.WhichOneof("variant")
+            field_map = _TELEMETRY_FIELDS.get(variant)
+            if field_map:
+                metrics = getattr(telemetry, variant)
+                for proto_name, field_name in field_map:
+                    value = getattr(metrics, proto_name)
+                    if value != 0:
+                        fields[field_name] = value
                     
         except Exception as e:
-            logger.debug(f"Error parsing telemetry: {e}")
+            logger.debug("Error parsing telemetry: %s", e)
             fields["parse_error"] = str(e)
         
         return fields
@@ -532,7 +841,7 @@ class MessageDecoder:
         fields = {}
         
         try:
-            user = mesh_pb2.User()
+            user = self._messages.user
             user.ParseFromString(payload)
             
             if user.id:
@@ -547,7 +856,7 @@ class MessageDecoder:
                 fields["hardware_model"] = user.hw_model
                 
         except Exception as e:
-            logger.debug(f"Error parsing nodeinfo: {e}")
+            logger.debug("Error parsing nodeinfo: %s", e)
             fields["parse_error"] = str(e)
         
         return fields
@@ -557,7 +866,7 @@ class MessageDecoder:
         fields = {}
         
         try:
-            neighbor_info = mesh_pb2.NeighborInfo()
+            neighbor_info = self._messages.neighbor_info
             neighbor_info.ParseFromString(payload)
             
             if neighbor_info.node_id != 0:
@@ -586,7 +895,7 @@ class MessageDecoder:
                 fields["neighbors"] = str(neighbors_list)  # Convert to string for display
                 
         except Exception as e:
-            logger.debug(f"Error parsing neighborinfo: {e}")
+            logger.debug("Error parsing neighborinfo: %s", e)
             fields["parse_error"] = str(e)
         
         return fields
@@ -603,4 +912,4 @@ class MessageDecoder:
         """
         if node_id == 0 or node_id == 0xFFFFFFFF:
             return "broadcast"
-        return f"!{node_id:08x}"
+        return _node_id_string(node_id)
@@ -2,9 +2,10 @@
 
 import re
 from datetime import datetime
-from typing import Dict, List, Optional
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
 
-from src.config import ColorConfig, KeywordConfig
+from src.config import ColorConfig, KeywordConfig, hardware_model_table
 from src.decoder import DecodedMessage
 
 
@@ -54,6 +55,13 @@ class ANSIColors:
         "white_bold": WHITE_BOLD,
     }
     
+    # Read-only lookup accepting lowercase and uppercase names as given;
+    # only mixed-case names need lowercasing
+    _COLOR_LOOKUP = MappingProxyType({
+        **COLOR_MAP,
+        **{name.upper(): code for name, code in COLOR_MAP.items()},
+    })
+    
     @staticmethod
     def get_color_code(color_name: str) -> str:
         """
@@ -65,7 +73,8 @@ class ANSIColors:
         Returns:
             ANSI color code string, or empty string if not found
         """
-        return ANSIColors.COLOR_MAP.get(color_name.lower(), "")
+        lookup = ANSIColors._COLOR_LOOKUP
+        return lookup.get(color_name) or lookup.get(color_name.lower(), "")
     
     @staticmethod
     def apply_color(text: str, color_name: str) -> str:
@@ -86,6 +95,43 @@ class ANSIColors:
 
 
 
+def _identity(text: str) -> str:
+    return text
+
+
+# Value formatters, bound once so formatting a field is a single call
+_FMT_LATLON = "{:.6f}".format
+_FMT_VOLT = "{:.2f}V".format
+_FMT_TEMP = "{:.1f}°C".format
+_FMT_F2 = "{:.2f}".format
+_FMT_TIMESTAMP = "[{:04d}-{:02d}-{:02d} {:02d}:{:02d}:{:02d}]".format
+
+
+def _format_time(value: datetime) -> str:
+    # HH:MM:SS without parsing a strftime pattern per call
+    return value.time().isoformat("seconds")
+
+
+def _format_string(value: str) -> str:
+    # Strings - truncate if too long
+    if len(value) > 100:
+        return f'"{value[:97]}..."'
+    return f'"{value}"'
+
+
+# Lines longer than this are checked for plain keyword substrings before
+# running the highlight regex over them
+_KEYWORD_PREFILTER_LENGTH = 512
+
+# Upper bound on cached prefixes for packet types missing from the color
+# config (JSON payloads can carry arbitrary type names)
+_MAX_PACKET_TYPE_PREFIXES = 256
+
+# Upper bound on cached formatter tables for field names (JSON payloads
+# can carry arbitrary field names)
+_MAX_FIELD_FORMATTERS = 256
+
+
 class OutputFormatter:
     """
     Formats decoded Meshtastic messages for console output.
@@ -94,12 +140,30 @@ class OutputFormatter:
     to make messages easy to read and analyze.
     """
     
+    __slots__ = (
+        "color_config",
+        "display_fields",
+        "keywords",
+        "hardware_models",
+        "_hardware_model_names",
+        "_default_packet_color",
+        "_packet_type_prefix",
+        "_display_fields",
+        "_timestamp_cache",
+        "_field_formatters",
+        "_keyword_prefixes",
+        "_keyword_pattern",
+        "_highlight",
+        "_sensitive_literals",
+        "_folded_literals",
+    )
+    
     def __init__(
         self,
         color_config: ColorConfig,
         display_fields: Dict[str, List[str]],
         keywords: List[KeywordConfig],
-        hardware_models: Optional[Dict[int, str]] = None,
+        hardware_models: Optional[Mapping[int, str]] = None,
     ):
         """
         Initialize output formatter.
@@ -114,6 +178,59 @@ class OutputFormatter:
         self.display_fields = display_fields
         self.keywords = keywords
         self.hardware_models = hardware_models or {}
+        self._hardware_model_names = hardware_model_table(self.hardware_models)
+        
+        # Resolve colored packet type indicators and display field orders
+        # once; both are fixed for the lifetime of the formatter
+        packet_type_colors = color_config.packet_type_colors
+        self._default_packet_color = packet_type_colors.get("default", "white")
+        self._packet_type_prefix = {
+            packet_type: ANSIColors.apply_color(f"[{packet_type}]", color)
+            for packet_type, color in packet_type_colors.items()
+        }
+        self._display_fields = {
+            packet_type: tuple(fields)
+            for packet_type, fields in display_fields.items()
+        }
+        
+        # Last formatted timestamp, keyed by its wall-clock fields down to
+        # the second; bursts of messages usually land within the same second.
+        # Key and string live in one tuple so concurrent callers never see a
+        # key paired with another second's string.
+        self._timestamp_cache: Tuple[Optional[tuple], str] = (None, "")
+        
+        # Per field name: value type -> formatting function, resolved the
+        # first time the field name is seen
+        self._field_formatters: Dict[str, Dict[type, Callable[[Any], str]]] = {}
+        
+        # Combine all keywords into a single alternation so highlighting is
+        # one scan of the text. Longer keywords go first so they win over
+        # keywords they contain; case-insensitive ones use a scoped flag.
+        ordered = sorted(
+            (kw for kw in keywords if kw.keyword),
+            key=lambda kw: len(kw.keyword),
+            reverse=True,
+        )
+        # ANSI color code per keyword (empty for unknown colors)
+        self._keyword_prefixes = [ANSIColors.get_color_code(kw.color) for kw in ordered]
+        self._keyword_pattern = None
+        if ordered:
+            self._keyword_pattern = re.compile("|".join(
+                f"(?P<kw{i}>{re.escape(kw.keyword)})" if kw.case_sensitive
+                else f"(?P<kw{i}>(?i:{re.escape(kw.keyword)}))"
+                for i, kw in enumerate(ordered)
+            ))
+        self._highlight = (
+            self._apply_keyword_highlighting if ordered else _identity
+        )
+        
+        # Literal keywords for the substring prefilter on long lines
+        self._sensitive_literals = tuple(
+            kw.keyword for kw in ordered if kw.case_sensitive
+        )
+        self._folded_literals = tuple(
+            kw.keyword.casefold() for kw in ordered if not kw.case_sensitive
+        )
     
     def format_message(self, message: DecodedMessage) -> str:
         """
@@ -125,37 +242,38 @@ class OutputFormatter:
         Returns:
             Formatted string ready for console output
         """
+        packet_type = message.packet_type
+        to_node = message.to_node
+        
         # Format timestamp
         timestamp_str = self._format_timestamp(message.timestamp)
         
         # Format packet type with color
-        packet_type_str = self._format_packet_type(message.packet_type)
-        
-        # Format basic info
-        channel_str = f"Channel: {message.channel}"
-        from_str = f"From: {message.from_node}"
-        to_str = f"To: {message.to_node}"
+        packet_type_str = self._format_packet_type(packet_type)
         
         # Format fields based on packet type
-        fields_str = self._format_fields(message.fields, message.packet_type)
+        fields_str = self._format_fields(message.fields, packet_type)
         
         # Build output line
-        parts = [timestamp_str, packet_type_str, channel_str, from_str]
+        out = [
+            timestamp_str, " | ",
+            packet_type_str, " | Channel: ",
+            str(message.channel), " | From: ",
+            str(message.from_node),
+        ]
         
         # Only add "To" if it's not broadcast
-        if message.to_node != "broadcast":
-            parts.append(to_str)
+        if to_node != "broadcast":
+            out += (" | To: ", str(to_node))
         
         # Add fields if present
         if fields_str:
-            parts.append(fields_str)
+            out += (" | ", fields_str)
         
-        output = " | ".join(parts)
+        output = "".join(out)
         
         # Apply keyword highlighting (this should be done last)
-        output = self._apply_keyword_highlighting(output)
-        
-        return output
+        return self._highlight(output)
     
     def _format_timestamp(self, timestamp: datetime) -> str:
         """
@@ -167,7 +285,17 @@ class OutputFormatter:
         Returns:
             Formatted timestamp string
         """
-        return f"[{timestamp.strftime('%Y-%m-%d %H:%M:%S')}]"
+        key = (
+            timestamp.year, timestamp.month, timestamp.day,
+            timestamp.hour, timestamp.minute, timestamp.second,
+        )
+        cached_key, cached_value = self._timestamp_cache
+        if key == cached_key:
+            return cached_value
+        
+        value = _FMT_TIMESTAMP(*key)
+        self._timestamp_cache = (key, value)
+        return value
     
     def _format_packet_type(self, packet_type: str) -> str:
         """
@@ -179,23 +307,21 @@ class OutputFormatter:
         Returns:
             Colored packet type string
         """
-        # Get color for this packet type
-        color = self.color_config.packet_type_colors.get(
-            packet_type,
-            self.color_config.packet_type_colors.get("default", "white")
-        )
-        
-        # Apply color
-        colored_type = ANSIColors.apply_color(f"[{packet_type}]", color)
-        
-        return colored_type
+        prefix = self._packet_type_prefix.get(packet_type)
+        if prefix is None:
+            prefix = ANSIColors.apply_color(
+                f"[{packet_type}]", self._default_packet_color
+            )
+            if len(self._packet_type_prefix) < _MAX_PACKET_TYPE_PREFIXES:
+                self._packet_type_prefix[packet_type] = prefix
+        return prefix
     
-    def _format_fields(self, fields: Dict[str, any], packet_type: str) -> str:
+    def _format_fields(self, fields: Mapping[str, Any], packet_type: str) -> str:
         """
         Format message fields based on display configuration.
         
         Args:
-            fields: Dictionary of field names to values
+            fields: Mapping of field names to values
             packet_type: Type of packet (determines which fields to display)
             
         Returns:
@@ -204,24 +330,24 @@ class OutputFormatter:
         if not fields:
             return ""
         
-        # Get configured fields for this packet type
-        configured_fields = self.display_fields.get(packet_type, [])
-        
-        # If no configuration, display all fields
-        if not configured_fields:
-            configured_fields = list(fields.keys())
+        # Get configured fields for this packet type; if there's no
+        # configuration, display all fields
+        configured_fields: Iterable[str] = (
+            self._display_fields.get(packet_type) or fields.keys()
+        )
         
         # Format each configured field that exists in the message
+        format_value = self._format_field_value
         formatted_parts = []
         for field_name in configured_fields:
             if field_name in fields:
                 value = fields[field_name]
-                formatted_value = self._format_field_value(field_name, value)
+                formatted_value = format_value(field_name, value)
                 formatted_parts.append(f"{field_name}: {formatted_value}")
         
         return " | ".join(formatted_parts)
     
-    def _format_field_value(self, field_name: str, value: any) -> str:
+    def _format_field_value(self, field_name: str, value: Any) -> str:
         """
         Format a single field value.
         
@@ -232,33 +358,76 @@ class OutputFormatter:
         Returns:
             Formatted value string
         """
+        formatters = self._field_formatters.get(field_name)
+        if formatters is None:
+            formatters = self._resolve_field_formatters(field_name)
+        
+        value_type = type(value)
+        formatter = formatters.get(value_type)
+        if formatter is None:
+            # Subclasses (e.g. bool for int) use their nearest base type
+            formatter = next(
+                (formatters[base] for base in value_type.__mro__ if base in formatters),
+                str,
+            )
+            formatters[value_type] = formatter
+        return formatter(value)
+    
+    def _resolve_field_formatters(self, field_name: str) -> Dict[type, Callable[[Any], str]]:
+        """
+        Choose the value formatters for a field name and cache them.
+        
+        Once _MAX_FIELD_FORMATTERS names are cached, further names are
+        resolved on every call instead of being stored.
+        
+        Args:
+            field_name: Name of the field
+            
+        Returns:
+            Mapping of value type to formatting function
+        """
+        name = field_name.lower()
+        
+        # Format floats with reasonable precision
+        if "latitude" in name or "longitude" in name:
+            float_formatter = _FMT_LATLON
+        elif "voltage" in name:
+            float_formatter = _FMT_VOLT
+        elif "temperature" in name:
+            float_formatter = _FMT_TEMP
+        else:
+            float_formatter = _FMT_F2
+        
+        formatters: Dict[type, Callable[[Any], str]] = {
+            float: float_formatter,
+            datetime: _format_time,
+            str: _format_string,
+        }
+        
         # Handle hardware_model field specially
-        if field_name == "hardware_model" and isinstance(value, int):
-            hw_name = self.hardware_models.get(value, "UNKNOWN")
-            return f"{value} ({hw_name})"
-        
-        # Handle different value types
-        if isinstance(value, float):
-            # Format floats with reasonable precision
-            if "latitude" in field_name.lower() or "longitude" in field_name.lower():
-                return f"{value:.6f}"
-            elif "voltage" in field_name.lower():
-                return f"{value:.2f}V"
-            elif "temperature" in field_name.lower():
-                return f"{value:.1f}°C"
-            else:
-                return f"{value:.2f}"
-        elif isinstance(value, datetime):
-            # Format datetime values
-            return value.strftime('%H:%M:%S')
-        elif isinstance(value, str):
-            # Strings - truncate if too long
-            if len(value) > 100:
-                return f'"{value[:97]}..."'
-            return f'"{value}"'
+        if field_name == "hardware_model":
+            formatters[int] = self._format_hardware_model
+        
+        if len(self._field_formatters) < _MAX_FIELD_FORMATTERS:
+            self._field_formatters[field_name] = formatters
+        return formatters
+    
+    def _format_hardware_model(self, value: int) -> str:
+        """
+        Format a hardware model number with its name.
+        
+        Args:
+            value: Hardware model number
+            
+        Returns:
+            Model number followed by its name in parentheses
+        """
+        names = self._hardware_model_names
+        if 0 <= value < len(names):
+            hw_name = names[value]
         else:
-            # Default string conversion
-            return str(value)
+            hw_name = self.hardware_models.get(value, "UNKNOWN")
+        return f"{value} ({hw_name})"
 
     
     def _apply_keyword_highlighting(self, text: str) -> str:
@@ -274,29 +443,37 @@ class OutputFormatter:
         Returns:
             Text with keyword highlighting applied
         """
-        if not self.keywords:
+        if self._keyword_pattern is None:
             return text
         
-        # Process each keyword
-        for keyword_config in self.keywords:
-            keyword = keyword_config.keyword
-            color = keyword_config.color
-            case_sensitive = keyword_config.case_sensitive
-            
-            # Create regex pattern
-            if case_sensitive:
-                pattern = re.compile(re.escape(keyword))
-            else:
-                pattern = re.compile(re.escape(keyword), re.IGNORECASE)
-            
-            # Find all matches
-            matches = list(pattern.finditer(text))
-            
-            # Apply highlighting in reverse order to preserve positions
-            for match in reversed(matches):
-                start, end = match.span()
-                matched_text = text[start:end]
-                highlighted_text = ANSIColors.apply_color(matched_text, color)
-                text = text[:start] + highlighted_text + text[end:]
+        if len(text) > _KEYWORD_PREFILTER_LENGTH and not self._contains_keyword(text):
+            return text
         
-        return text
+        prefixes = self._keyword_prefixes
+        reset = ANSIColors.RESET
+        
+        def wrap(match: "re.Match[str]") -> str:
+            # Every alternative is a named kw<index> group, so one always matched
+            group_name = match.lastgroup
+            assert group_name is not None
+            prefix = prefixes[int(group_name[2:])]
+            return prefix + match.group() + reset if prefix else match.group()
+        
+        return self._keyword_pattern.sub(wrap, text)
+    
+    def _contains_keyword(self, text: str) -> bool:
+        """
+        Check whether any keyword occurs in text as a plain substring.
+        
+        Args:
+            text: Text to search
+            
+        Returns:
+            True if at least one keyword may match
+        """
+        if any(literal in text for literal in self._sensitive_literals):
+            return True
+        if self._folded_literals:
+            folded = text.casefold()
+            return any(literal in folded for literal in self._folded_literals)
+        return False
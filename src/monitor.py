@@ -3,11 +3,12 @@
 import logging
 import signal
 import sys
+import threading
 from typing import Optional
 
 from src import __version__
 from src.config import MonitorConfig
-from src.decoder import MessageDecoder
+from src.decoder import DecodedMessage, MessageDecoder
 from src.formatter import OutputFormatter
 from src.mqtt_client import MQTTClient
 
@@ -34,8 +35,16 @@ class MeshtasticMonitor:
         self.mqtt_client: Optional[MQTTClient] = None
         self.decoder: Optional[MessageDecoder] = None
         self.formatter: Optional[OutputFormatter] = None
+        self._stop_event = threading.Event()
+        
+        # Messages are processed on several MQTT worker threads; keep each
+        # printed line whole
+        self._print_lock = threading.Lock()
         self._running = False
         
+        # Lowercase the text filter once instead of per message
+        self._filter_text_lower = config.filter_text.lower() if config.filter_text else None
+        
         # Set up signal handlers for graceful shutdown
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
@@ -48,6 +57,7 @@ class MeshtasticMonitor:
         and begins monitoring messages.
         """
         self._running = True
+        self._stop_event.clear()
         
         # Display startup information
         self._display_startup_info()
@@ -73,36 +83,26 @@ class MeshtasticMonitor:
                 self._on_message_received,
             )
             
+            # Subscribe as soon as the connection is established
+            logger.info(f"Subscribing to topic: {self.config.topic}")
+            self.mqtt_client.preset_subscriptions(self.config.topic)
+            
             # Connect to MQTT broker
             if not self.mqtt_client.connect():
                 logger.error("Failed to connect to MQTT broker")
                 sys.exit(1)
             
             # Wait for connection to establish
-            import time
-            max_wait = 10  # seconds
-            waited = 0
-            while not self.mqtt_client.is_connected() and waited < max_wait:
-                time.sleep(0.5)
-                waited += 0.5
-            
-            if not self.mqtt_client.is_connected():
+            if not self.mqtt_client.wait_for_connection(timeout=10):
                 logger.error("Connection timeout - could not connect to MQTT broker")
                 sys.exit(1)
             
-            # Subscribe to configured topic
-            logger.info(f"Subscribing to topic: {self.config.topic}")
-            if not self.mqtt_client.subscribe(self.config.topic):
-                logger.error(f"Failed to subscribe to topic: {self.config.topic}")
-                sys.exit(1)
-            
             print("\n" + "="*80)
             print("Monitor is running. Press Ctrl+C to stop.")
             print("="*80 + "\n")
             
-            # Keep the main thread alive
-            while self._running:
-                time.sleep(1)
+            # Keep the main thread alive until stopped
+            self._stop_event.wait()
         
         except Exception as e:
             logger.error(f"Error in monitor application: {e}", exc_info=True)
@@ -119,6 +119,7 @@ class MeshtasticMonitor:
             return
         
         self._running = False
+        self._stop_event.set()
         
         print("\n" + "="*80)
         print("Shutting down monitor...")
@@ -143,34 +144,68 @@ class MeshtasticMonitor:
             payload: Raw message payload bytes
         """
         try:
+            config = self.config
+            decoder = self.decoder
+            # Messages only arrive after start() has created the components
+            assert decoder is not None
+            
+            # Drop messages the packet type filter rejects before decoding
+            # them, when their type can be read cheaply
+            if config.filter_type:
+                peeked_type = decoder.peek_packet_type(topic, payload)
+                if peeked_type is not None and peeked_type != config.filter_type:
+                    return  # Skip this message
+            
             # Decode the message
-            decoded_message = self.decoder.decode(topic, payload)
+            decoded_message = decoder.decode(topic, payload)
+            packet_type = decoded_message.packet_type
             
             # Hide decode errors if configured
-            if self.config.hide_decode_errors and decoded_message.packet_type == "DECODE_ERROR":
+            if config.hide_decode_errors and packet_type == "DECODE_ERROR":
                 return  # Skip decode errors
             
             # Apply filters if configured
-            if self.config.filter_type:
+            if config.filter_type:
                 # Filter by packet type
-                if decoded_message.packet_type != self.config.filter_type:
+                if packet_type != config.filter_type:
+                    return  # Skip this message
+            
+            # Apply text filter before formatting so rejected messages
+            # never pay for formatting and highlighting
+            if self._filter_text_lower is not None:
+                if self._filter_text_lower not in self._filter_haystack(decoded_message):
                     return  # Skip this message
             
             # Format the message
             formatted_output = self.formatter.format_message(decoded_message)
             
-            # Apply text filter if configured
-            if self.config.filter_text:
-                # Case-insensitive search in the formatted output
-                if self.config.filter_text.lower() not in formatted_output.lower():
-                    return  # Skip this message
-            
             # Display the formatted message
-            print(formatted_output)
+            with self._print_lock:
+                print(formatted_output)
         
         except Exception as e:
             logger.error(f"Error processing message: {e}", exc_info=True)
     
+    @staticmethod
+    def _filter_haystack(message: DecodedMessage) -> str:
+        """
+        Build the lowercased text searched by the text filter.
+        
+        Covers the packet type, channel, node IDs and every field name and
+        value of the decoded message, without any ANSI color codes.
+        
+        Args:
+            message: Decoded message to search
+            
+        Returns:
+            Lowercased search text
+        """
+        parts = [message.packet_type, str(message.channel), message.from_node, message.to_node]
+        for name, value in message.fields.items():
+            parts.append(name)
+            parts.append(str(value))
+        return " ".join(parts).lower()
+    
     def _display_startup_info(self) -> None:
         """Display startup information including version and configuration."""
         print("\n" + "="*80)
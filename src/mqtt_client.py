@@ -1,17 +1,39 @@
 """MQTT client wrapper for Meshtastic MQTT Monitor."""
 
 import logging
+import os
+import queue
+import socket
 import ssl
+import threading
 import time
-from typing import Callable, Optional
+from typing import Any, Callable, List, Optional, Union
 
 import paho.mqtt.client as mqtt
+from paho.mqtt.properties import Properties
+from paho.mqtt.reasoncodes import ReasonCode
 
 from src.config import MQTTConfig
 
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of received messages waiting for the worker thread
+_MESSAGE_QUEUE_SIZE = 10000
+
+# Queue item telling a worker thread to exit
+_STOP = object()
+
+# Worker threads delivering queued messages; decryption and protobuf
+# parsing release the GIL, so a few workers overlap well
+_WORKER_COUNT = min(4, os.cpu_count() or 1)
+
+# Socket receive buffer size requested for busy brokers
+_SOCKET_RCVBUF = 1 << 20
+
+# CONNACK reason codes that mean the credentials were rejected
+_AUTH_FAILURE_CODES = (134, 135)
+
 
 class MQTTClient:
     """
@@ -39,12 +61,23 @@ class MQTTClient:
         self._client: Optional[mqtt.Client] = None
         self._subscribed_topics: list[str] = []
         self._is_connected = False
+        self._connected_event = threading.Event()
         self._reconnect_delay = 1  # Initial reconnect delay in seconds
         self._max_reconnect_delay = 60  # Maximum reconnect delay
         self._should_reconnect = True
         
+        # Received messages are handed to worker threads so decoding and
+        # output never block paho's network thread
+        self._message_queue: queue.Queue = queue.Queue(maxsize=_MESSAGE_QUEUE_SIZE)
+        self._workers: List[threading.Thread] = []
+        self._dropped_messages = 0
+        
         # Create MQTT client instance
-        self._client = mqtt.Client(client_id="", clean_session=True)
+        self._client = mqtt.Client(
+            callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
+            client_id="",
+            clean_session=True,
+        )
         
         # Set up callbacks
         self._client.on_connect = self._on_connect
@@ -86,8 +119,10 @@ class MQTTClient:
                 self.config.port,
                 keepalive=60,
             )
+            self._tune_socket()
             
-            # Start network loop in background thread
+            # Start message workers and network loop in background threads
+            self._start_workers()
             self._client.loop_start()
             
             return True
@@ -96,15 +131,70 @@ class MQTTClient:
             logger.error(f"Failed to connect to MQTT broker: {e}")
             return False
 
+    def _tune_socket(self) -> None:
+        """Enlarge the socket receive buffer to absorb bursts of messages."""
+        if self._client is None:
+            return
+        
+        sock = self._client.socket()
+        if not isinstance(sock, socket.socket):
+            return
+        
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _SOCKET_RCVBUF)
+        except OSError as e:
+            logger.debug(f"Could not set socket receive buffer: {e}")
+
     def disconnect(self) -> None:
         """Disconnect from MQTT broker and stop network loop."""
         self._should_reconnect = False
         self._is_connected = False
+        self._connected_event.clear()
         
         if self._client:
             self._client.loop_stop()
             self._client.disconnect()
             logger.info("Disconnected from MQTT broker")
+        
+        self._stop_workers()
+
+    def _start_workers(self) -> None:
+        """Start the message worker threads if they are not already running."""
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+        for index in range(len(self._workers), _WORKER_COUNT):
+            worker = threading.Thread(
+                target=self._consume,
+                name=f"mqtt-message-worker-{index}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _stop_workers(self) -> None:
+        """Stop the message worker threads after they drain queued messages."""
+        workers = [worker for worker in self._workers if worker.is_alive()]
+        for _ in workers:
+            self._message_queue.put(_STOP)
+        
+        current = threading.current_thread()
+        for worker in workers:
+            if worker is not current:
+                worker.join(timeout=5)
+        self._workers = []
+
+    def _consume(self) -> None:
+        """Deliver queued messages to the user callback until stopped."""
+        while True:
+            item = self._message_queue.get()
+            if item is _STOP:
+                break
+            
+            topic, payload = item
+            try:
+                # Call the user-provided callback with topic and payload
+                self.on_message_callback(topic, payload)
+            except Exception as e:
+                logger.error(f"Error in message callback: {e}")
 
     def subscribe(self, topic: str) -> bool:
         """
@@ -137,6 +227,19 @@ class MQTTClient:
             logger.error(f"Exception while subscribing to {topic}: {e}")
             return False
 
+    def preset_subscriptions(self, topic: str) -> None:
+        """
+        Register a topic to subscribe to once connected.
+        
+        The subscription is made from the connect callback, so it can be set
+        before connecting and is restored after every reconnection.
+        
+        Args:
+            topic: MQTT topic or topic pattern to subscribe to
+        """
+        if topic not in self._subscribed_topics:
+            self._subscribed_topics.append(topic)
+
     def is_connected(self) -> bool:
         """
         Check if client is connected to MQTT broker.
@@ -146,12 +249,25 @@ class MQTTClient:
         """
         return self._is_connected
 
+    def wait_for_connection(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the client is connected to the MQTT broker.
+        
+        Args:
+            timeout: Maximum time to wait in seconds, or None to wait forever
+            
+        Returns:
+            True if connected, False if the timeout expired first
+        """
+        return self._connected_event.wait(timeout)
+
     def _on_connect(
         self,
         client: mqtt.Client,
-        userdata: any,
-        flags: dict,
-        rc: int,
+        userdata: Any,
+        flags: mqtt.ConnectFlags,
+        reason_code: Union[ReasonCode, int],
+        properties: Optional[Properties] = None,
     ) -> None:
         """
         Callback for when client connects to MQTT broker.
@@ -160,39 +276,52 @@ class MQTTClient:
             client: MQTT client instance
             userdata: User data (unused)
             flags: Connection flags
-            rc: Connection result code
+            reason_code: Connection reason code
+            properties: MQTT v5 properties (unused)
         """
-        if rc == 0:
+        if reason_code == 0:
             self._is_connected = True
+            self._connected_event.set()
             self._reconnect_delay = 1  # Reset reconnect delay on successful connection
             logger.info("Successfully connected to MQTT broker")
             
-            # Resubscribe to topics after reconnection
+            # Subscribe to preset topics and resubscribe after reconnection
             for topic in self._subscribed_topics:
-                self._client.subscribe(topic, qos=0)
-                logger.info(f"Resubscribed to topic: {topic}")
+                result, mid = self._client.subscribe(topic, qos=0)
+                if result == mqtt.MQTT_ERR_SUCCESS:
+                    logger.info(f"Subscribed to topic: {topic}")
+                else:
+                    logger.error(f"Failed to subscribe to {topic}: error code {result}")
         else:
             self._is_connected = False
+            self._connected_event.clear()
             error_messages = {
-                1: "Connection refused - incorrect protocol version",
-                2: "Connection refused - invalid client identifier",
-                3: "Connection refused - server unavailable",
-                4: "Connection refused - bad username or password",
-                5: "Connection refused - not authorized",
+                128: "Connection refused - unspecified error",
+                132: "Connection refused - incorrect protocol version",
+                133: "Connection refused - invalid client identifier",
+                134: "Connection refused - bad username or password",
+                135: "Connection refused - not authorized",
+                136: "Connection refused - server unavailable",
             }
-            error_msg = error_messages.get(rc, f"Unknown error code: {rc}")
+            # ReasonCode compares equal to ints but isn't hashable
+            code = (
+                reason_code.value if isinstance(reason_code, ReasonCode) else reason_code
+            )
+            error_msg = error_messages.get(code, f"Unknown error code: {reason_code}")
             logger.error(f"Connection failed: {error_msg}")
             
             # Don't retry on authentication failures
-            if rc == 4 or rc == 5:
+            if code in _AUTH_FAILURE_CODES:
                 self._should_reconnect = False
                 logger.error("Authentication failed. Please check credentials.")
 
     def _on_disconnect(
         self,
         client: mqtt.Client,
-        userdata: any,
-        rc: int,
+        userdata: Any,
+        flags: mqtt.DisconnectFlags,
+        reason_code: Union[ReasonCode, int],
+        properties: Optional[Properties] = None,
     ) -> None:
         """
         Callback for when client disconnects from MQTT broker.
@@ -202,12 +331,15 @@ class MQTTClient:
         Args:
             client: MQTT client instance
             userdata: User data (unused)
-            rc: Disconnection result code
+            flags: Disconnection flags
+            reason_code: Disconnection reason code
+            properties: MQTT v5 properties (unused)
         """
         self._is_connected = False
+        self._connected_event.clear()
         
-        if rc != 0:
-            logger.warning(f"Unexpected disconnection (code: {rc})")
+        if reason_code != 0:
+            logger.warning(f"Unexpected disconnection (code: {reason_code})")
             
             if self._should_reconnect:
                 logger.info(
@@ -231,19 +363,25 @@ class MQTTClient:
     def _on_message(
         self,
         client: mqtt.Client,
-        userdata: any,
+        userdata: Any,
         msg: mqtt.MQTTMessage,
     ) -> None:
         """
         Callback for when a message is received.
         
+        Only queues the message for the worker threads; messages are dropped
+        if the queue is full.
+        
         Args:
             client: MQTT client instance
             userdata: User data (unused)
             msg: Received MQTT message
         """
         try:
-            # Call the user-provided callback with topic and payload
-            self.on_message_callback(msg.topic, msg.payload)
-        except Exception as e:
-            logger.error(f"Error in message callback: {e}")
+            self._message_queue.put_nowait((msg.topic, msg.payload))
+        except queue.Full:
+            self._dropped_messages += 1
+            if self._dropped_messages % 1000 == 1:
+                logger.warning(
+                    f"Message queue full, dropped {self._dropped_messages} messages so far"
+                )
@@ -9,6 +9,7 @@ import pytest
 import yaml
 
 from src.config import (
+    HARDWARE_MODELS,
     ChannelConfig,
     ColorConfig,
     ConfigManager,
@@ -16,9 +17,15 @@ from src.config import (
     KeywordConfig,
     MonitorConfig,
     MQTTConfig,
+    hardware_model_name,
+    hardware_model_table,
 )
 
 
+# Same libyaml-backed dumper the config module uses when available
+_Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
 class TestMQTTConfig:
     """Tests for MQTTConfig dataclass."""
 
@@ -66,6 +73,27 @@ class TestChannelConfig:
         assert config.encryption_key is None
 
 
+class TestHardwareModelName:
+    """Tests for hardware_model_name lookup."""
+
+    def test_matches_mapping(self):
+        """Test that every known model resolves to its mapping entry."""
+        for model, name in HARDWARE_MODELS.items():
+            assert hardware_model_name(model) == name
+
+    def test_unknown_models(self):
+        """Test that unrecognised model numbers resolve to UNKNOWN."""
+        assert hardware_model_name(-1) == "UNKNOWN"
+        assert hardware_model_name(200) == "UNKNOWN"
+
+    def test_table_fills_gaps(self):
+        """Test that missing numbers in the dense range map to UNKNOWN."""
+        table = hardware_model_table({0: "UNSET", 2: "TBEAM", 255: "RESERVED"})
+        
+        assert table[:3] == ("UNSET", "UNKNOWN", "TBEAM")
+        assert len(table) == 82
+
+
 class TestConfigManager:
     """Tests for ConfigManager class."""
 
@@ -89,6 +117,26 @@ class TestConfigManager:
         assert "POSITION" in config.colors.packet_type_colors
         assert config.colors.packet_type_colors["POSITION"] == "green"
 
+    def test_get_default_config_mutation_safe(self):
+        """Test that mutating one default config doesn't leak into the next."""
+        first = ConfigManager.get_default_config()
+        first.mqtt.host = ""
+        first.channel_keys["Mutated"] = "AQ=="
+        first.display_fields["POSITION"].append("mutated")
+        first.colors.packet_type_colors["POSITION"] = "red"
+        first.keywords[0].keyword = "mutated"
+
+        second = ConfigManager.get_default_config()
+
+        assert second.mqtt is not first.mqtt
+        assert second.display_fields["POSITION"] is not first.display_fields["POSITION"]
+        assert second.keywords[0] is not first.keywords[0]
+        assert second.mqtt.host == "mqtt.villagesmesh.com"
+        assert "Mutated" not in second.channel_keys
+        assert "mutated" not in second.display_fields["POSITION"]
+        assert second.colors.packet_type_colors["POSITION"] == "green"
+        assert second.keywords[0].keyword != "mutated"
+
     def test_load_config_creates_default_when_missing(self):
         """Test that load_config creates default file when missing."""
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -101,6 +149,15 @@ class TestConfigManager:
             assert isinstance(config, MonitorConfig)
             assert config.mqtt.host == "mqtt.villagesmesh.com"
 
+    def test_load_config_missing_file_without_write(self):
+        """Test that write_default=False returns defaults without creating the file."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config_path = os.path.join(tmpdir, "config.yaml")
+            config = ConfigManager.load_config(config_path, write_default=False)
+            
+            assert not os.path.exists(config_path)
+            assert config.mqtt.host == "mqtt.villagesmesh.com"
+
     def test_load_config_valid_yaml(self):
         """Test loading valid YAML configuration."""
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -141,7 +198,7 @@ class TestConfigManager:
             }
             
             with open(config_path, "w") as f:
-                yaml.dump(config_data, f)
+                yaml.dump(config_data, f, Dumper=_Dumper)
             
             config = ConfigManager.load_config(config_path)
             
@@ -190,6 +247,20 @@ class TestConfigManager:
             assert config.mqtt.username == "meshdev"
             assert config.mqtt.password == "large4cats"
 
+    def test_parse_config_skips_malformed_entries(self):
+        """Test that channel and keyword entries without required keys are ignored."""
+        config = ConfigManager._parse_config({
+            "encryption": {
+                "channels": ["LongFast", 3, {"key": "AQ=="}, {"name": "Private", "key": "abc"}],
+            },
+            "colors": {
+                "keywords": ["emergency", None, {"color": "red"}, {"keyword": "beacon"}],
+            },
+        })
+        
+        assert config.channel_keys == {"Private": "abc"}
+        assert [kw.keyword for kw in config.keywords] == ["beacon"]
+
     def test_validate_config_valid(self):
         """Test validation of valid configuration."""
         config = ConfigManager.get_default_config()
@@ -303,6 +374,22 @@ class TestConfigManager:
         assert any(kw.keyword == "alert" and kw.color == "yellow" for kw in merged.keywords)
         assert any(kw.keyword == "test" and kw.color == "cyan" for kw in merged.keywords)
 
+    def test_merge_cli_args_repeated_highlight(self):
+        """Test that a keyword repeated on the CLI is added once with the last color."""
+        config = ConfigManager.get_default_config()
+        keyword_count = len(config.keywords)
+        
+        args = argparse.Namespace(
+            highlight=["beacon:red", "beacon:green"],
+        )
+        
+        merged = ConfigManager.merge_cli_args(config, args)
+        
+        matches = [kw for kw in merged.keywords if kw.keyword == "beacon"]
+        assert len(matches) == 1
+        assert matches[0].color == "green"
+        assert len(merged.keywords) == keyword_count + 1
+
     def test_create_argument_parser(self):
         """Test that argument parser is created with expected arguments."""
         parser = ConfigManager.create_argument_parser()
@@ -1,12 +1,15 @@
 """Unit tests for message decoder."""
 
 import base64
+import json
+import pickle
+import struct
 from datetime import datetime
 from unittest.mock import Mock, patch
 
 import pytest
 
-from src.decoder import DecodedMessage, MessageDecoder
+from src.decoder import DecodedMessage, LazyFields, MessageDecoder
 from meshtastic import mesh_pb2, mqtt_pb2, portnums_pb2, telemetry_pb2
 
 
@@ -47,6 +50,29 @@ class TestMessageDecoderInitialization:
         # Should not crash, but key won't be in decoded_keys
         assert "BadChannel" not in decoder._decoded_keys
 
+    def test_decoder_expands_short_keys(self):
+        """Test that channel PSKs are expanded to full AES keys at init."""
+        decoder = MessageDecoder({
+            "Default": "AQ==",  # index 1: the default Meshtastic key
+            "Unpadded": "AQ",
+            "Index2": "Ag==",
+            "Short": base64.b64encode(b"abc").decode(),
+            "Medium": base64.b64encode(b"x" * 20).decode(),
+            "NoCrypto": "AA==",
+            "Empty": "",
+            "TooLong": base64.b64encode(b"x" * 40).decode(),
+        })
+        
+        default_key = base64.b64decode("1PG7OiApB1nwvP+rz05pAQ==")
+        assert decoder._decoded_keys["Default"] == default_key
+        assert decoder._decoded_keys["Unpadded"] == default_key
+        assert decoder._decoded_keys["Index2"] == default_key[:-1] + b"\x02"
+        assert decoder._decoded_keys["Short"] == b"abc" + b"\x00" * 13
+        assert decoder._decoded_keys["Medium"] == b"x" * 20 + b"\x00" * 12
+        assert "NoCrypto" not in decoder._decoded_keys
+        assert "Empty" not in decoder._decoded_keys
+        assert "TooLong" not in decoder._decoded_keys
+
     def test_decoder_with_empty_keys(self):
         """Test decoder with no keys."""
         decoder = MessageDecoder({})
@@ -287,6 +313,60 @@ class TestMessageDecoding:
         assert result.fields["text"] == "Test message"
         assert result.decryption_success is True
 
+    def test_decode_bare_mesh_packet(self, decoder):
+        """Test decoding a MeshPacket published without a ServiceEnvelope."""
+        mesh_packet = mesh_pb2.MeshPacket()
+        setattr(mesh_packet, 'from', 0xa1b2c3d4)
+        mesh_packet.to = 0xFFFFFFFF
+        mesh_packet.decoded.portnum = portnums_pb2.PortNum.TEXT_MESSAGE_APP
+        mesh_packet.decoded.payload = b"No envelope"
+        
+        result = decoder.decode("msh/US/2/e/LongFast", mesh_packet.SerializeToString())
+        
+        assert result.packet_type == "TEXT_MESSAGE_APP"
+        assert result.from_node == "!a1b2c3d4"
+        assert result.fields["text"] == "No envelope"
+
+    def test_decode_results_independent_of_later_decodes(self, decoder):
+        """Test that reused protobuf messages don't leak into earlier results."""
+        payloads = []
+        for node, text in ((0x11111111, b"first"), (0x22222222, b"second")):
+            envelope = mqtt_pb2.ServiceEnvelope()
+            setattr(envelope.packet, 'from', node)
+            envelope.packet.decoded.portnum = portnums_pb2.PortNum.TEXT_MESSAGE_APP
+            envelope.packet.decoded.payload = text
+            payloads.append(envelope.SerializeToString())
+        
+        first = decoder.decode("msh/US/2/e/LongFast", payloads[0])
+        second = decoder.decode("msh/US/2/e/LongFast", payloads[1])
+        
+        assert first.from_node == "!11111111"
+        assert first.fields["text"] == "first"
+        assert second.from_node == "!22222222"
+        assert second.fields["text"] == "second"
+
+    def test_decode_json_message(self, decoder):
+        """Test decoding a JSON-format message."""
+        payload = (
+            b'{"type": "sendtext", "from": 2712847316, "to": 4294967295,'
+            b' "channel": 0, "id": 7, "payload": {"text": "hi", "id": 99}}'
+        )
+        
+        result = decoder.decode("msh/US/2/json/LongFast/!a1b2c3d4", payload)
+        
+        assert result.packet_type == "TEXT_MESSAGE_APP"
+        assert result.channel == "LongFast"
+        assert result.from_node == "!a1b2c3d4"
+        assert result.to_node == "!ffffffff"
+        assert result.fields == {"text": "hi", "id": 99, "channel": 0}
+
+    def test_decode_invalid_json_message(self, decoder):
+        """Test that malformed JSON is reported as JSON_ERROR."""
+        result = decoder.decode("msh/US/2/json/LongFast", b'{"type": ')
+        
+        assert result.packet_type == "JSON_ERROR"
+        assert result.decryption_success is False
+
     def test_decode_position_message(self, decoder):
         """Test decoding a position message."""
         # Create position
@@ -355,61 +435,186 @@ class TestMessageDecoding:
         assert result.channel == "Public"
 
 
+class TestPeekPacketType:
+    """Test cheap packet type detection."""
+
+    def test_peek_matches_decode_for_plain_packet(self, decoder):
+        """Test peeking an unencrypted packet."""
+        envelope = mqtt_pb2.ServiceEnvelope()
+        envelope.packet.decoded.portnum = portnums_pb2.PortNum.POSITION_APP
+        payload = envelope.SerializeToString()
+        
+        with patch.object(decoder, "_extract_payload_fields") as extract:
+            peeked = decoder.peek_packet_type("msh/US/2/e/LongFast", payload)
+        
+        extract.assert_not_called()
+        assert peeked == decoder.decode("msh/US/2/e/LongFast", payload).packet_type
+
+    def test_peek_encrypted_packet(self, decoder):
+        """Test peeking encrypted packets with and without a channel key."""
+        envelope = mqtt_pb2.ServiceEnvelope()
+        envelope.packet.id = 42
+        envelope.packet.encrypted = b"\x01\x02\x03"
+        payload = envelope.SerializeToString()
+        
+        with patch.object(decoder, "_decrypt_payload") as decrypt:
+            # No key for the channel: the result is known to be ENCRYPTED
+            assert decoder.peek_packet_type("msh/US/2/e/Unknown", payload) == "ENCRYPTED"
+            # Key available: only a full decode can tell the type
+            assert decoder.peek_packet_type("msh/US/2/e/LongFast", payload) is None
+        
+        decrypt.assert_not_called()
+
+    def test_peek_other_payloads(self, decoder):
+        """Test peeking status, JSON and unparseable payloads."""
+        assert decoder.peek_packet_type("msh/US/2/stat/!a1b2c3d4", b"online") == "STATUS"
+        assert decoder.peek_packet_type("msh/US/2/json/LongFast", b'{"type": "text"}') is None
+        assert decoder.peek_packet_type("msh/US/2/e/LongFast", b"invalid protobuf data") is None
+
+
+class TestLazyFields:
+    """Test deferred field extraction."""
+
+    def test_extraction_deferred_until_access(self):
+        """Test that the extractor runs once, on first read."""
+        extract = Mock(return_value={"text": "hello"})
+        fields = LazyFields(extract, b"payload")
+        
+        extract.assert_not_called()
+        assert fields["text"] == "hello"
+        assert "text" in fields
+        assert dict(fields) == {"text": "hello"}
+        extract.assert_called_once_with(b"payload")
+
+    def test_decode_skips_extraction_when_unread(self, decoder):
+        """Test that decoding alone does not parse the payload."""
+        envelope = mqtt_pb2.ServiceEnvelope()
+        envelope.packet.decoded.portnum = portnums_pb2.PortNum.TEXT_MESSAGE_APP
+        envelope.packet.decoded.payload = b"Deferred"
+        
+        with patch.object(decoder, "_extract_payload_fields") as extract:
+            result = decoder.decode("msh/US/2/e/LongFast", envelope.SerializeToString())
+            extract.assert_not_called()
+        
+        assert result.packet_type == "TEXT_MESSAGE_APP"
+
+    def test_decoded_message_serializable(self, decoder):
+        """Test that decoded messages pickle and JSON-encode as documented."""
+        envelope = mqtt_pb2.ServiceEnvelope()
+        envelope.packet.decoded.portnum = portnums_pb2.PortNum.TEXT_MESSAGE_APP
+        envelope.packet.decoded.payload = b"Hello"
+        result = decoder.decode("msh/US/2/e/LongFast", envelope.SerializeToString())
+        
+        restored = pickle.loads(pickle.dumps(result))
+        assert type(restored.fields) is dict
+        assert restored.fields == {"text": "Hello"}
+        
+        # The JSONFormatter example in DEVELOPER.md
+        output = json.loads(json.dumps({
+            "timestamp": result.timestamp.isoformat(),
+            "packet_type": result.packet_type,
+            "fields": dict(result.fields),
+        }))
+        assert output["fields"] == {"text": "Hello"}
+
+
+class TestTimestamps:
+    """Test receive timestamp caching."""
+
+    def test_timestamp_reused_within_resolution(self, decoder):
+        """Test that the wall clock is only re-read once the window passes."""
+        with patch("src.decoder.time.monotonic_ns") as monotonic_ns:
+            monotonic_ns.return_value = decoder._now_ns + 1000
+            first = decoder._now()
+            assert decoder._now() is first
+            
+            monotonic_ns.return_value = decoder._now_ns + 2_000_000
+            assert decoder._now() is not first
+
+
 class TestDecryption:
     """Test message decryption functionality."""
 
     def test_decrypt_with_valid_key(self, decoder):
-        """Test decryption with valid key."""
-        # Note: This is a simplified test. Real Meshtastic encryption is more complex.
-        # We're testing that the method handles the decryption attempt gracefully.
+        """Test decryption with the Meshtastic packet-ID/sender nonce."""
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+        
+        plaintext = b"encrypted_payload"
+        nonce = struct.pack("<QII", 0x1234, 0xABCDEF12, 0)
+        encryptor = Cipher(algorithms.AES(b"0123456789abcdef"), modes.CTR(nonce)).encryptor()
+        encrypted_data = encryptor.update(plaintext)
         
-        encrypted_data = b"\x00\x01\x02\x03\x04\x05\x06\x07" + b"encrypted_payload"
+        result = decoder._decrypt_payload(encrypted_data, "LongFast", 0x1234, 0xABCDEF12)
         
-        # Attempt decryption (may return None if format doesn't match)
-        result = decoder._decrypt_payload(encrypted_data, "LongFast")
+        assert result == plaintext
+
+    def test_decrypt_with_wrong_nonce(self, decoder):
+        """Test that a different packet ID does not recover the plaintext."""
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+        
+        plaintext = b"encrypted_payload"
+        nonce = struct.pack("<QII", 0x1234, 0xABCDEF12, 0)
+        encryptor = Cipher(algorithms.AES(b"0123456789abcdef"), modes.CTR(nonce)).encryptor()
+        encrypted_data = encryptor.update(plaintext)
         
-        # Should not crash, result may be None or decrypted data
-        assert result is None or isinstance(result, bytes)
+        result = decoder._decrypt_payload(encrypted_data, "LongFast", 0x1235, 0xABCDEF12)
+        
+        assert result != plaintext
 
     def test_decrypt_without_key(self, decoder):
         """Test decryption attempt without key."""
         encrypted_data = b"some_encrypted_data"
         
-        result = decoder._decrypt_payload(encrypted_data, "UnknownChannel")
+        result = decoder._decrypt_payload(encrypted_data, "UnknownChannel", 1, 1)
         
         assert result is None
 
-    def test_decrypt_with_short_data(self, decoder):
-        """Test decryption with data too short for nonce."""
-        encrypted_data = b"short"
-        
-        result = decoder._decrypt_payload(encrypted_data, "LongFast")
+    def test_decrypt_with_empty_data(self, decoder):
+        """Test decryption with no ciphertext."""
+        result = decoder._decrypt_payload(b"", "LongFast", 1, 1)
         
         assert result is None
 
+    def test_decode_encrypted_message(self, decoder):
+        """Test decoding an encrypted packet end to end."""
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+        
+        data_msg = mesh_pb2.Data()
+        data_msg.portnum = portnums_pb2.PortNum.TEXT_MESSAGE_APP
+        data_msg.payload = b"Secret"
+        
+        nonce = struct.pack("<QII", 42, 0x12345678, 0)
+        encryptor = Cipher(algorithms.AES(b"0123456789abcdef"), modes.CTR(nonce)).encryptor()
+        
+        envelope = mqtt_pb2.ServiceEnvelope()
+        envelope.packet.id = 42
+        setattr(envelope.packet, "from", 0x12345678)
+        envelope.packet.to = 0xFFFFFFFF
+        envelope.packet.encrypted = encryptor.update(data_msg.SerializeToString())
+        
+        result = decoder.decode("msh/US/2/e/LongFast/!12345678", envelope.SerializeToString())
+        
+        assert result.packet_type == "TEXT_MESSAGE_APP"
+        assert result.fields["text"] == "Secret"
+        assert result.decryption_success is True
+
 
 class TestExtractFieldsGeneric:
     """Test generic field extraction."""
 
     def test_extract_fields_unknown_type(self, decoder):
         """Test extracting fields from unknown packet type."""
-        data_msg = mesh_pb2.Data()
-        data_msg.portnum = 999
-        data_msg.payload = b"unknown payload"
-        
-        fields = decoder._extract_fields(data_msg, "UNKNOWN_999")
+        fields = decoder._extract_payload_fields(999, b"unknown payload", "UNKNOWN_999")
         
         assert "payload_size" in fields
         assert fields["payload_size"] == len(b"unknown payload")
 
     def test_extract_fields_with_exception(self, decoder):
         """Test field extraction handles exceptions gracefully."""
-        data_msg = mesh_pb2.Data()
-        data_msg.portnum = portnums_pb2.PortNum.POSITION_APP
-        data_msg.payload = b"invalid position data"
-        
         # Should not crash
-        fields = decoder._extract_fields(data_msg, "POSITION")
+        fields = decoder._extract_payload_fields(
+            portnums_pb2.PortNum.POSITION_APP, b"invalid position data", "POSITION"
+        )
         
         # May have parse_error or be empty
         assert isinstance(fields, dict)
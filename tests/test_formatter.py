@@ -5,27 +5,29 @@ from datetime import datetime
 
 from src.config import ColorConfig, KeywordConfig
 from src.decoder import DecodedMessage
-from src.formatter import ANSIColors, OutputFormatter
+from src.formatter import _MAX_FIELD_FORMATTERS, ANSIColors, OutputFormatter
 
 
 class TestANSIColors:
     """Tests for ANSI color code utilities."""
     
-    def test_get_color_code_valid(self):
-        """Test getting valid color codes."""
-        assert ANSIColors.get_color_code("red") == "\033[31m"
-        assert ANSIColors.get_color_code("green") == "\033[32m"
-        assert ANSIColors.get_color_code("blue") == "\033[34m"
-    
-    def test_get_color_code_bold(self):
-        """Test getting bold color codes."""
-        assert ANSIColors.get_color_code("red_bold") == "\033[1;31m"
-        assert ANSIColors.get_color_code("green_bold") == "\033[1;32m"
-    
-    def test_get_color_code_case_insensitive(self):
-        """Test that color names are case-insensitive."""
-        assert ANSIColors.get_color_code("RED") == "\033[31m"
-        assert ANSIColors.get_color_code("Green") == "\033[32m"
+    @pytest.mark.parametrize(
+        "color_name,expected",
+        [
+            ("red", "\033[31m"),
+            ("green", "\033[32m"),
+            ("blue", "\033[34m"),
+            ("red_bold", "\033[1;31m"),
+            ("green_bold", "\033[1;32m"),
+            ("RED", "\033[31m"),
+            ("Green", "\033[32m"),
+            ("RED_BOLD", "\033[1;31m"),
+            ("Red_Bold", "\033[1;31m"),
+        ],
+    )
+    def test_get_color_code(self, color_name, expected):
+        """Test getting regular and bold color codes in any letter case."""
+        assert ANSIColors.get_color_code(color_name) == expected
     
     def test_get_color_code_invalid(self):
         """Test getting invalid color code returns empty string."""
@@ -46,7 +48,7 @@ class TestANSIColors:
 class TestOutputFormatter:
     """Tests for output formatter."""
     
-    @pytest.fixture
+    @pytest.fixture(scope="class")
     def basic_color_config(self):
         """Create basic color configuration."""
         return ColorConfig(
@@ -59,7 +61,7 @@ class TestOutputFormatter:
             keyword_highlights={},
         )
     
-    @pytest.fixture
+    @pytest.fixture(scope="class")
     def basic_display_fields(self):
         """Create basic display field configuration."""
         return {
@@ -68,7 +70,7 @@ class TestOutputFormatter:
             "TELEMETRY_APP": ["battery_level", "voltage"],
         }
     
-    @pytest.fixture
+    @pytest.fixture(scope="class")
     def formatter(self, basic_color_config, basic_display_fields):
         """Create formatter instance."""
         from src.config import HARDWARE_MODELS
@@ -84,7 +86,16 @@ class TestOutputFormatter:
         dt = datetime(2024, 11, 15, 14, 23, 45)
         result = formatter._format_timestamp(dt)
         assert result == "[2024-11-15 14:23:45]"
-    
+
+    def test_format_timestamp_cached_per_second(self, formatter):
+        """Test that timestamps within a second reuse the cached string."""
+        first = formatter._format_timestamp(datetime(2024, 11, 15, 14, 23, 45, 100))
+        second = formatter._format_timestamp(datetime(2024, 11, 15, 14, 23, 45, 900))
+        assert second is first
+
+        later = formatter._format_timestamp(datetime(2024, 11, 15, 14, 23, 46))
+        assert later == "[2024-11-15 14:23:46]"
+
     def test_format_packet_type(self, formatter):
         """Test packet type formatting with color."""
         result = formatter._format_packet_type("POSITION")
@@ -98,23 +109,18 @@ class TestOutputFormatter:
         assert "[UNKNOWN]" in result
         assert "\033[37m" in result  # white color code (default)
     
-    def test_format_field_value_float(self, formatter):
+    @pytest.mark.parametrize(
+        "field_name,value,expected",
+        [
+            ("latitude", 37.774929, "37.774929"),
+            ("voltage", 3.85, "3.85V"),
+            ("temperature", 22.5, "22.5°C"),
+            ("value", 123.456, "123.46"),
+        ],
+    )
+    def test_format_field_value_float(self, formatter, field_name, value, expected):
         """Test formatting float values."""
-        # Latitude/longitude
-        result = formatter._format_field_value("latitude", 37.774929)
-        assert result == "37.774929"
-        
-        # Voltage
-        result = formatter._format_field_value("voltage", 3.85)
-        assert result == "3.85V"
-        
-        # Temperature
-        result = formatter._format_field_value("temperature", 22.5)
-        assert result == "22.5°C"
-        
-        # Generic float
-        result = formatter._format_field_value("value", 123.456)
-        assert result == "123.46"
+        assert formatter._format_field_value(field_name, value) == expected
     
     def test_format_field_value_datetime(self, formatter):
         """Test formatting datetime values."""
@@ -134,6 +140,30 @@ class TestOutputFormatter:
         assert result.startswith('"aaa')
         assert result.endswith('..."')
         assert len(result) <= 105  # 100 chars + quotes + ellipsis
+
+    def test_format_field_value_by_type_per_field(self, formatter):
+        """Test that one field name formats each value type appropriately."""
+        assert formatter._format_field_value("hardware_model", 9) == "9 (RAK4631)"
+        assert formatter._format_field_value("hardware_model", 255) == "255 (RESERVED)"
+        assert formatter._format_field_value("hardware_model", "T-Beam") == '"T-Beam"'
+        assert formatter._format_field_value("battery_level", 87) == "87"
+        assert formatter._format_field_value("battery_level", True) == "True"
+        assert formatter._format_field_value("Latitude", 1.5) == "1.500000"
+    
+    def test_field_formatter_cache_bounded(self):
+        """Test that arbitrary field names can't grow the formatter cache forever."""
+        formatter = OutputFormatter(
+            color_config=ColorConfig(packet_type_colors={"default": "white"}),
+            display_fields={},
+            keywords=[],
+            hardware_models={},
+        )
+        
+        for index in range(_MAX_FIELD_FORMATTERS + 50):
+            assert formatter._format_field_value(f"field_{index}", 1.0) == "1.00"
+        
+        assert len(formatter._field_formatters) == _MAX_FIELD_FORMATTERS
+        assert formatter._format_field_value("voltage", 3.85) == "3.85V"
     
     def test_format_fields_configured(self, formatter):
         """Test formatting fields with configuration."""
@@ -268,7 +298,54 @@ class TestOutputFormatter:
         
         assert "\033[31m" in result  # red for error
         assert "\033[33m" in result  # yellow for warning
-    
+
+    def test_keyword_highlighting_overlapping_keywords(self):
+        """Test that the longest keyword wins and case sensitivity is per keyword."""
+        color_config = ColorConfig(
+            packet_type_colors={"default": "white"},
+            keyword_highlights={},
+        )
+        keywords = [
+            KeywordConfig(keyword="SOS", case_sensitive=True, color="red"),
+            KeywordConfig(keyword="sos beacon", case_sensitive=False, color="green"),
+        ]
+        formatter = OutputFormatter(
+            color_config=color_config,
+            display_fields={},
+            keywords=keywords,
+            hardware_models={},
+        )
+
+        result = formatter._apply_keyword_highlighting("SOS Beacon, SOS, sos")
+
+        assert result == (
+            "\033[32mSOS Beacon\033[0m, \033[31mSOS\033[0m, sos"
+        )
+
+    def test_keyword_highlighting_long_text(self):
+        """Test that keywords are still found in lines past the prefilter length."""
+        color_config = ColorConfig(
+            packet_type_colors={"default": "white"},
+            keyword_highlights={},
+        )
+        keywords = [
+            KeywordConfig(keyword="Alert", case_sensitive=True, color="yellow"),
+            KeywordConfig(keyword="emergency", case_sensitive=False, color="red"),
+        ]
+        formatter = OutputFormatter(
+            color_config=color_config,
+            display_fields={},
+            keywords=keywords,
+            hardware_models={},
+        )
+
+        padding = "x" * 1000
+        assert formatter._apply_keyword_highlighting(padding) == padding
+        assert formatter._apply_keyword_highlighting(padding + " ALERT") == padding + " ALERT"
+
+        result = formatter._apply_keyword_highlighting(padding + " EMERGENCY")
+        assert result.endswith("\033[31mEMERGENCY\033[0m")
+
     def test_keyword_highlighting_no_keywords(self, formatter):
         """Test that highlighting works with no keywords configured."""
         text = "This is a test message"
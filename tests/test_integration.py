@@ -1,10 +1,14 @@
 """Integration tests for Meshtastic MQTT Monitor."""
 
 import base64
+import struct
+import threading
 import time
+from datetime import datetime
 from unittest.mock import MagicMock, patch
 
 import pytest
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from meshtastic import mesh_pb2, mqtt_pb2, portnums_pb2
 
 from src.config import (
@@ -14,15 +18,95 @@ from src.config import (
     MonitorConfig,
     MQTTConfig,
 )
-from src.decoder import MessageDecoder
+from src.decoder import DecodedMessage, MessageDecoder
 from src.formatter import OutputFormatter
 from src.monitor import MeshtasticMonitor
 
 
+_TEST_CHANNEL_KEY = b'\x01' * 16  # 16-byte key
+
+
+@pytest.fixture(scope="session")
+def text_envelope_bytes():
+    """Build an unencrypted text message envelope once per session."""
+    data_msg = mesh_pb2.Data()
+    data_msg.portnum = portnums_pb2.PortNum.TEXT_MESSAGE_APP
+    data_msg.payload = "Hello World".encode("utf-8")
+    
+    mesh_packet = mesh_pb2.MeshPacket()
+    setattr(mesh_packet, 'from', 0x12345678)
+    mesh_packet.to = 0xFFFFFFFF  # broadcast
+    mesh_packet.decoded.CopyFrom(data_msg)
+    
+    envelope = mqtt_pb2.ServiceEnvelope()
+    envelope.packet.CopyFrom(mesh_packet)
+    envelope.channel_id = "LongFast"
+    
+    return "msh/test/2/e/LongFast/!12345678", envelope.SerializeToString()
+
+
+@pytest.fixture(scope="session")
+def encrypted_envelope_bytes():
+    """Build an encrypted text message envelope once per session."""
+    data_msg = mesh_pb2.Data()
+    data_msg.portnum = portnums_pb2.PortNum.TEXT_MESSAGE_APP
+    data_msg.payload = "Secret Message".encode("utf-8")
+    
+    # Encrypt the data message with the Meshtastic nonce
+    # (packet ID as uint64 LE, sender as uint32 LE, four zero bytes)
+    packet_id = 0x0BADF00D
+    nonce = struct.pack("<QII", packet_id, 0xABCDEF12, 0)
+    
+    cipher = Cipher(
+        algorithms.AES(_TEST_CHANNEL_KEY),
+        modes.CTR(nonce),
+    )
+    encryptor = cipher.encryptor()
+    
+    plaintext = data_msg.SerializeToString()
+    encrypted_payload = encryptor.update(plaintext) + encryptor.finalize()
+    
+    # Create mesh packet with encrypted data
+    mesh_packet = mesh_pb2.MeshPacket()
+    mesh_packet.id = packet_id
+    setattr(mesh_packet, 'from', 0xABCDEF12)
+    mesh_packet.to = 0x12345678
+    mesh_packet.encrypted = encrypted_payload
+    
+    envelope = mqtt_pb2.ServiceEnvelope()
+    envelope.packet.CopyFrom(mesh_packet)
+    envelope.channel_id = "TestChannel"
+    
+    return "msh/test/2/e/TestChannel/!abcdef12", envelope.SerializeToString()
+
+
+@pytest.fixture(scope="session")
+def position_envelope_bytes():
+    """Build a position message envelope once per session."""
+    position = mesh_pb2.Position()
+    position.latitude_i = int(37.7749 * 1e7)  # San Francisco
+    position.longitude_i = int(-122.4194 * 1e7)
+    position.altitude = 15
+    
+    data_msg = mesh_pb2.Data()
+    data_msg.portnum = portnums_pb2.PortNum.POSITION_APP
+    data_msg.payload = position.SerializeToString()
+    
+    mesh_packet = mesh_pb2.MeshPacket()
+    setattr(mesh_packet, 'from', 0x11223344)
+    mesh_packet.to = 0xFFFFFFFF
+    mesh_packet.decoded.CopyFrom(data_msg)
+    
+    envelope = mqtt_pb2.ServiceEnvelope()
+    envelope.packet.CopyFrom(mesh_packet)
+    
+    return "msh/test/LongFast", envelope.SerializeToString()
+
+
 class TestEndToEndMessageFlow:
     """Test end-to-end message flow with mock MQTT broker."""
     
-    def test_unencrypted_text_message_flow(self):
+    def test_unencrypted_text_message_flow(self, text_envelope_bytes):
         """Test complete flow for unencrypted text message."""
         # Create a test configuration
         config = MonitorConfig(
@@ -52,24 +136,7 @@ class TestEndToEndMessageFlow:
             config.hardware_models,
         )
         
-        # Create a test message
-        text_payload = "Hello World".encode("utf-8")
-        
-        data_msg = mesh_pb2.Data()
-        data_msg.portnum = portnums_pb2.PortNum.TEXT_MESSAGE_APP
-        data_msg.payload = text_payload
-        
-        mesh_packet = mesh_pb2.MeshPacket()
-        setattr(mesh_packet, 'from', 0x12345678)
-        mesh_packet.to = 0xFFFFFFFF  # broadcast
-        mesh_packet.decoded.CopyFrom(data_msg)
-        
-        envelope = mqtt_pb2.ServiceEnvelope()
-        envelope.packet.CopyFrom(mesh_packet)
-        envelope.channel_id = "LongFast"
-        
-        payload = envelope.SerializeToString()
-        topic = "msh/test/e/TestChannel/LongFast"
+        topic, payload = text_envelope_bytes
         
         # Decode the message
         decoded = decoder.decode(topic, payload)
@@ -91,11 +158,9 @@ class TestEndToEndMessageFlow:
         assert "From: !12345678" in formatted
         assert 'text: "Hello World"' in formatted
     
-    def test_encrypted_message_flow(self):
+    def test_encrypted_message_flow(self, encrypted_envelope_bytes):
         """Test complete flow for encrypted message."""
-        # Create encryption key
-        encryption_key = b'\x01' * 16  # 16-byte key
-        key_b64 = base64.b64encode(encryption_key).decode('ascii')
+        key_b64 = base64.b64encode(_TEST_CHANNEL_KEY).decode('ascii')
         
         # Create configuration with encryption key
         config = MonitorConfig(
@@ -117,54 +182,21 @@ class TestEndToEndMessageFlow:
         # Create decoder
         decoder = MessageDecoder(config.channel_keys)
         
-        # Create a text message
-        text_payload = "Secret Message".encode("utf-8")
-        
-        data_msg = mesh_pb2.Data()
-        data_msg.portnum = portnums_pb2.PortNum.TEXT_MESSAGE_APP
-        data_msg.payload = text_payload
-        
-        # Encrypt the data message
-        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-        from cryptography.hazmat.backends import default_backend
-        
-        nonce = b'\x00' * 8
-        nonce_padded = nonce + b'\x00' * 8
-        
-        cipher = Cipher(
-            algorithms.AES(encryption_key),
-            modes.CTR(nonce_padded),
-            backend=default_backend()
-        )
-        encryptor = cipher.encryptor()
-        
-        plaintext = data_msg.SerializeToString()
-        ciphertext = encryptor.update(plaintext) + encryptor.finalize()
-        encrypted_payload = nonce + ciphertext
-        
-        # Create mesh packet with encrypted data
-        mesh_packet = mesh_pb2.MeshPacket()
-        setattr(mesh_packet, 'from', 0xABCDEF12)
-        mesh_packet.to = 0x12345678
-        mesh_packet.encrypted = encrypted_payload
-        
-        envelope = mqtt_pb2.ServiceEnvelope()
-        envelope.packet.CopyFrom(mesh_packet)
-        envelope.channel_id = "TestChannel"
-        
-        payload = envelope.SerializeToString()
-        topic = "msh/test/e/region/TestChannel"
+        topic, payload = encrypted_envelope_bytes
         
         # Decode the message
         decoded = decoder.decode(topic, payload)
         
-        # Verify message was processed (encryption may not work perfectly in test)
+        # Verify the message was decrypted with the channel's key
+        assert decoded.decryption_success is True
+        assert decoded.packet_type == "TEXT_MESSAGE_APP"
+        assert decoded.fields["text"] == "Secret Message"
         assert decoded.from_node == "!abcdef12"
         assert decoded.to_node == "!12345678"
-        # Channel extraction from topic (5th element in path)
+        # Channel extraction from topic (the segment after the type)
         assert decoded.channel == "TestChannel"
     
-    def test_position_message_flow(self):
+    def test_position_message_flow(self, position_envelope_bytes):
         """Test complete flow for position message."""
         config = MonitorConfig(
             mqtt=MQTTConfig(host="test.mqtt.broker"),
@@ -187,26 +219,7 @@ class TestEndToEndMessageFlow:
             config.hardware_models,
         )
         
-        # Create position message
-        position = mesh_pb2.Position()
-        position.latitude_i = int(37.7749 * 1e7)  # San Francisco
-        position.longitude_i = int(-122.4194 * 1e7)
-        position.altitude = 15
-        
-        data_msg = mesh_pb2.Data()
-        data_msg.portnum = portnums_pb2.PortNum.POSITION_APP
-        data_msg.payload = position.SerializeToString()
-        
-        mesh_packet = mesh_pb2.MeshPacket()
-        setattr(mesh_packet, 'from', 0x11223344)
-        mesh_packet.to = 0xFFFFFFFF
-        mesh_packet.decoded.CopyFrom(data_msg)
-        
-        envelope = mqtt_pb2.ServiceEnvelope()
-        envelope.packet.CopyFrom(mesh_packet)
-        
-        payload = envelope.SerializeToString()
-        topic = "msh/test/LongFast"
+        topic, payload = position_envelope_bytes
         
         # Decode and format
         decoded = decoder.decode(topic, payload)
@@ -224,14 +237,11 @@ class TestEndToEndMessageFlow:
         assert "longitude:" in formatted
 
 
-class TestConfigurationIntegration:
-    """Test configuration integration with other components."""
-    
-    def test_config_file_to_monitor(self, tmp_path):
-        """Test loading config file and initializing monitor."""
-        # Create a test config file
-        config_file = tmp_path / "test_config.yaml"
-        config_content = """
+@pytest.fixture(scope="session")
+def full_config_file(tmp_path_factory):
+    """Write a complete configuration file once per session."""
+    config_file = tmp_path_factory.mktemp("config") / "test_config.yaml"
+    config_content = """
 version: "1.0"
 
 mqtt:
@@ -260,10 +270,33 @@ colors:
     TEXT_MESSAGE_APP: "cyan"
   keywords: []
 """
-        config_file.write_text(config_content)
-        
+    config_file.write_text(config_content)
+    return str(config_file)
+
+
+@pytest.fixture(scope="session")
+def override_config_file(tmp_path_factory):
+    """Write a minimal configuration file for CLI override tests once per session."""
+    config_file = tmp_path_factory.mktemp("config") / "test_config.yaml"
+    config_content = """
+mqtt:
+  host: "original.broker.com"
+  port: 1883
+
+monitoring:
+  topic: "msh/original/#"
+"""
+    config_file.write_text(config_content)
+    return str(config_file)
+
+
+class TestConfigurationIntegration:
+    """Test configuration integration with other components."""
+    
+    def test_config_file_to_monitor(self, full_config_file):
+        """Test loading config file and initializing monitor."""
         # Load configuration
-        config = ConfigManager.load_config(str(config_file))
+        config = ConfigManager.load_config(full_config_file)
         
         # Verify configuration
         assert config.mqtt.host == "test.broker.com"
@@ -283,22 +316,10 @@ colors:
         )
         assert formatter is not None
     
-    def test_cli_args_override_config(self, tmp_path):
+    def test_cli_args_override_config(self, override_config_file):
         """Test that CLI arguments override config file values."""
-        # Create a test config file
-        config_file = tmp_path / "test_config.yaml"
-        config_content = """
-mqtt:
-  host: "original.broker.com"
-  port: 1883
-
-monitoring:
-  topic: "msh/original/#"
-"""
-        config_file.write_text(config_content)
-        
         # Load configuration
-        config = ConfigManager.load_config(str(config_file))
+        config = ConfigManager.load_config(override_config_file)
         
         # Create mock CLI args
         from argparse import Namespace
@@ -321,6 +342,7 @@ monitoring:
         assert config.topic == "msh/override/#"
 
 
+@pytest.mark.xdist_group(name="monitor")
 class TestMonitorLifecycle:
     """Test monitor application lifecycle."""
     
@@ -351,14 +373,11 @@ class TestMonitorLifecycle:
         assert monitor.formatter is None
     
     @patch('src.monitor.MQTTClient')
-    @patch('time.sleep')
-    def test_monitor_start_and_stop(self, mock_sleep, mock_mqtt_client_class):
+    def test_monitor_start_and_stop(self, mock_mqtt_client_class):
         """Test monitor start and stop lifecycle."""
         # Create mock MQTT client
         mock_client = MagicMock()
         mock_client.connect.return_value = True
-        mock_client.is_connected.return_value = True
-        mock_client.subscribe.return_value = True
         mock_mqtt_client_class.return_value = mock_client
         
         # Create configuration
@@ -371,11 +390,12 @@ class TestMonitorLifecycle:
         # Create monitor
         monitor = MeshtasticMonitor(config)
         
-        # Mock the running loop to stop immediately
-        def stop_after_start(*args):
+        # Stop the monitor as soon as it connects so start() returns
+        def stop_after_connect(timeout=None):
             monitor.stop()
+            return True
         
-        mock_sleep.side_effect = stop_after_start
+        mock_client.wait_for_connection.side_effect = stop_after_connect
         
         # Start monitor (will stop immediately due to mock)
         monitor.start()
@@ -387,7 +407,68 @@ class TestMonitorLifecycle:
         
         # Verify MQTT operations were called
         mock_client.connect.assert_called_once()
-        mock_client.subscribe.assert_called_once_with("msh/test/#")
+        mock_client.preset_subscriptions.assert_called_once_with("msh/test/#")
         
         # Verify disconnect was called
         mock_client.disconnect.assert_called_once()
+    
+    @patch('src.monitor.MQTTClient')
+    def test_monitor_stop_from_another_thread(self, mock_mqtt_client_class):
+        """Test that stop() wakes start() while it waits for shutdown."""
+        mock_client = MagicMock()
+        mock_client.connect.return_value = True
+        mock_client.wait_for_connection.return_value = True
+        mock_mqtt_client_class.return_value = mock_client
+        
+        config = MonitorConfig(
+            mqtt=MQTTConfig(host="test.broker.com"),
+            topic="msh/test/#",
+            channel_keys={},
+        )
+        monitor = MeshtasticMonitor(config)
+        
+        runner = threading.Thread(target=monitor.start, daemon=True)
+        runner.start()
+        
+        # Let start() reach its wait for the stop event
+        deadline = time.monotonic() + 2
+        while not mock_client.wait_for_connection.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        
+        monitor.stop()
+        runner.join(2)
+        
+        assert not runner.is_alive()
+        mock_client.disconnect.assert_called_once()
+    
+    def test_text_filter_skips_formatting_for_rejected_messages(self, capsys):
+        """Test that the text filter runs on decoded fields before formatting."""
+        config = MonitorConfig(
+            mqtt=MQTTConfig(host="test.broker.com"),
+            topic="msh/test/#",
+            channel_keys={},
+            filter_text="Hello",
+        )
+        monitor = MeshtasticMonitor(config)
+        monitor.decoder = MagicMock()
+        monitor.formatter = MagicMock()
+        monitor.formatter.format_message.return_value = "formatted"
+        
+        message = DecodedMessage(
+            timestamp=datetime.now(),
+            channel="LongFast",
+            from_node="!a1b2c3d4",
+            to_node="broadcast",
+            packet_type="TEXT_MESSAGE_APP",
+            fields={"text": "hello mesh"},
+        )
+        monitor.decoder.decode.return_value = message
+        monitor._on_message_received("msh/test", b"")
+        assert capsys.readouterr().out == "formatted\n"
+        
+        monitor.formatter.format_message.reset_mock()
+        message.fields = {"text": "goodbye"}
+        monitor._on_message_received("msh/test", b"")
+        monitor.formatter.format_message.assert_not_called()
+        assert capsys.readouterr().out == ""
@@ -1,16 +1,47 @@
 """Unit tests for MQTT client wrapper."""
 
-import time
-from unittest.mock import MagicMock, Mock, call, patch
+import queue
+import ssl
+from types import SimpleNamespace
+from unittest.mock import Mock, call, patch
 
 import paho.mqtt.client as mqtt
 import pytest
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.reasoncodes import ReasonCode
 
 from src.config import MQTTConfig
-from src.mqtt_client import MQTTClient
+from src.mqtt_client import _STOP, _WORKER_COUNT, MQTTClient
+
+
+# paho result codes, resolved once for the subscribe tests
+_ERR_SUCCESS = mqtt.MQTT_ERR_SUCCESS
+_ERR_NO_CONN = mqtt.MQTT_ERR_NO_CONN
+
+
+@pytest.fixture(autouse=True, scope="module")
+def no_sleep():
+    """Skip the reconnect backoff delay for every test in this module."""
+    with patch("src.mqtt_client.time.sleep") as mock_sleep:
+        yield mock_sleep
+
+
+@pytest.fixture(autouse=True)
+def mock_client_class(monkeypatch):
+    """Replace the paho client class so no test opens a real connection."""
+    mock_class = Mock()
+    mock_class.return_value = Mock(spec=mqtt.Client)
+    monkeypatch.setattr("src.mqtt_client.mqtt.Client", mock_class)
+    return mock_class
 
 
 @pytest.fixture
+def mock_client(mock_client_class):
+    """Return the paho client instance the wrapper constructs."""
+    return mock_client_class.return_value
+
+
+@pytest.fixture(scope="session")
 def mqtt_config():
     """Create a basic MQTT configuration for testing."""
     return MQTTConfig(
@@ -23,7 +54,7 @@ def mqtt_config():
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mqtt_config_tls():
     """Create an MQTT configuration with TLS enabled."""
     return MQTTConfig(
@@ -42,19 +73,30 @@ def message_callback():
     return Mock()
 
 
+@pytest.fixture
+def client(mqtt_config, message_callback):
+    """Create an MQTT client wrapping the mocked paho client."""
+    client = MQTTClient(mqtt_config, message_callback)
+    yield client
+    # Don't leave worker threads running for the rest of the session
+    client._stop_workers()
+
+
 class TestMQTTClientInitialization:
     """Test MQTT client initialization."""
 
-    @patch("src.mqtt_client.mqtt.Client")
-    def test_client_initialization(self, mock_client_class, mqtt_config, message_callback):
+    def test_client_initialization(
+        self, mock_client_class, mock_client, mqtt_config, message_callback
+    ):
         """Test that client is initialized with correct parameters."""
-        mock_client = MagicMock()
-        mock_client_class.return_value = mock_client
-        
         client = MQTTClient(mqtt_config, message_callback)
         
         # Verify client was created
-        mock_client_class.assert_called_once_with(client_id="", clean_session=True)
+        mock_client_class.assert_called_once_with(
+            callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
+            client_id="",
+            clean_session=True,
+        )
         
         # Verify callbacks were set
         assert client._client.on_connect is not None
@@ -64,28 +106,21 @@ class TestMQTTClientInitialization:
         # Verify authentication was set
         mock_client.username_pw_set.assert_called_once_with("testuser", "testpass")
 
-    @patch("src.mqtt_client.mqtt.Client")
-    def test_client_initialization_without_auth(self, mock_client_class, message_callback):
+    def test_client_initialization_without_auth(self, mock_client, message_callback):
         """Test client initialization without authentication."""
-        mock_client = MagicMock()
-        mock_client_class.return_value = mock_client
-        
         config = MQTTConfig(host="test.broker", port=1883, username=None, password=None)
         client = MQTTClient(config, message_callback)
         
         # Verify authentication was not set
         mock_client.username_pw_set.assert_not_called()
 
-    @patch("src.mqtt_client.ssl.create_default_context")
-    @patch("src.mqtt_client.mqtt.Client")
     def test_client_initialization_with_tls(
-        self, mock_client_class, mock_ssl_context, mqtt_config_tls, message_callback
+        self, monkeypatch, mock_client, mqtt_config_tls, message_callback
     ):
         """Test client initialization with TLS enabled."""
-        mock_client = MagicMock()
-        mock_client_class.return_value = mock_client
-        mock_context = MagicMock()
-        mock_ssl_context.return_value = mock_context
+        mock_context = Mock(spec=ssl.SSLContext)
+        mock_ssl_context = Mock(return_value=mock_context)
+        monkeypatch.setattr("src.mqtt_client.ssl.create_default_context", mock_ssl_context)
         
         client = MQTTClient(mqtt_config_tls, message_callback)
         
@@ -100,13 +135,8 @@ class TestMQTTClientInitialization:
 class TestMQTTClientConnection:
     """Test MQTT client connection handling."""
 
-    @patch("src.mqtt_client.mqtt.Client")
-    def test_connect_success(self, mock_client_class, mqtt_config, message_callback):
+    def test_connect_success(self, mock_client, client):
         """Test successful connection to MQTT broker."""
-        mock_client = MagicMock()
-        mock_client_class.return_value = mock_client
-        
-        client = MQTTClient(mqtt_config, message_callback)
         result = client.connect()
         
         # Verify connection was attempted
@@ -116,26 +146,17 @@ class TestMQTTClientConnection:
         )
         mock_client.loop_start.assert_called_once()
 
-    @patch("src.mqtt_client.mqtt.Client")
-    def test_connect_failure(self, mock_client_class, mqtt_config, message_callback):
+    def test_connect_failure(self, mock_client, client):
         """Test connection failure handling."""
-        mock_client = MagicMock()
         mock_client.connect.side_effect = Exception("Connection failed")
-        mock_client_class.return_value = mock_client
         
-        client = MQTTClient(mqtt_config, message_callback)
         result = client.connect()
         
         # Verify connection failure was handled
         assert result is False
 
-    @patch("src.mqtt_client.mqtt.Client")
-    def test_disconnect(self, mock_client_class, mqtt_config, message_callback):
+    def test_disconnect(self, mock_client, client):
         """Test disconnection from MQTT broker."""
-        mock_client = MagicMock()
-        mock_client_class.return_value = mock_client
-        
-        client = MQTTClient(mqtt_config, message_callback)
         client._is_connected = True
         client.disconnect()
         
@@ -145,13 +166,8 @@ class TestMQTTClientConnection:
         assert client._is_connected is False
         assert client._should_reconnect is False
 
-    @patch("src.mqtt_client.mqtt.Client")
-    def test_is_connected(self, mock_client_class, mqtt_config, message_callback):
+    def test_is_connected(self, client):
         """Test connection status check."""
-        mock_client = MagicMock()
-        mock_client_class.return_value = mock_client
-        
-        client = MQTTClient(mqtt_config, message_callback)
         
         # Initially not connected
         assert client.is_connected() is False
@@ -160,34 +176,43 @@ class TestMQTTClientConnection:
         client._is_connected = True
         assert client.is_connected() is True
 
+    def test_wait_for_connection(self, mock_client, client):
+        """Test waiting for the connection to be established."""
+        
+        # Times out while not connected
+        assert client.wait_for_connection(timeout=0) is False
+        
+        # Returns once the connect callback reports success
+        client._on_connect(mock_client, None, {}, 0, None)
+        assert client.wait_for_connection(timeout=0) is True
+        
+        # Cleared again on disconnection
+        client._on_disconnect(mock_client, None, {}, 0, None)
+        assert client.wait_for_connection(timeout=0) is False
+
 
 class TestMQTTClientSubscription:
     """Test MQTT client topic subscription."""
 
-    @patch("src.mqtt_client.mqtt.Client")
-    def test_subscribe_success(self, mock_client_class, mqtt_config, message_callback):
-        """Test successful topic subscription."""
-        mock_client = MagicMock()
-        mock_client.subscribe.return_value = (mqtt.MQTT_ERR_SUCCESS, 1)
-        mock_client_class.return_value = mock_client
-        
-        client = MQTTClient(mqtt_config, message_callback)
+    @pytest.mark.parametrize(
+        "result_code,subscribed",
+        [(_ERR_SUCCESS, True), (_ERR_NO_CONN, False)],
+        ids=["success", "failure"],
+    )
+    def test_subscribe(self, mock_client, client, result_code, subscribed):
+        """Test topic subscription and failure handling."""
+        mock_client.subscribe.return_value = (result_code, 1)
         client._is_connected = True
         
         result = client.subscribe("test/topic/#")
         
-        # Verify subscription
-        assert result is True
+        # Only successful subscriptions are remembered for reconnection
+        assert result is subscribed
         mock_client.subscribe.assert_called_once_with("test/topic/#", qos=0)
-        assert "test/topic/#" in client._subscribed_topics
+        assert ("test/topic/#" in client._subscribed_topics) is subscribed
 
-    @patch("src.mqtt_client.mqtt.Client")
-    def test_subscribe_not_connected(self, mock_client_class, mqtt_config, message_callback):
+    def test_subscribe_not_connected(self, mock_client, client):
         """Test subscription attempt when not connected."""
-        mock_client = MagicMock()
-        mock_client_class.return_value = mock_client
-        
-        client = MQTTClient(mqtt_config, message_callback)
         client._is_connected = False
         
         result = client.subscribe("test/topic")
@@ -196,72 +221,64 @@ class TestMQTTClientSubscription:
         assert result is False
         mock_client.subscribe.assert_not_called()
 
-    @patch("src.mqtt_client.mqtt.Client")
-    def test_subscribe_failure(self, mock_client_class, mqtt_config, message_callback):
-        """Test subscription failure handling."""
-        mock_client = MagicMock()
-        mock_client.subscribe.return_value = (mqtt.MQTT_ERR_NO_CONN, 1)
-        mock_client_class.return_value = mock_client
+    def test_preset_subscriptions(self, mock_client, client):
+        """Test that preset topics are subscribed once connected."""
+        mock_client.subscribe.return_value = (_ERR_SUCCESS, 1)
         
-        client = MQTTClient(mqtt_config, message_callback)
-        client._is_connected = True
+        client.preset_subscriptions("test/topic/#")
+        client.preset_subscriptions("test/topic/#")
         
-        result = client.subscribe("test/topic")
+        # Nothing is sent before the connection is up
+        mock_client.subscribe.assert_not_called()
+        assert client._subscribed_topics == ["test/topic/#"]
         
-        # Verify subscription failure was handled
-        assert result is False
+        client._on_connect(mock_client, None, {}, 0, None)
+        mock_client.subscribe.assert_called_once_with("test/topic/#", qos=0)
 
 
 class TestMQTTClientCallbacks:
     """Test MQTT client callback handling."""
 
-    @patch("src.mqtt_client.mqtt.Client")
-    def test_on_connect_success(self, mock_client_class, mqtt_config, message_callback):
-        """Test successful connection callback."""
-        mock_client = MagicMock()
-        mock_client_class.return_value = mock_client
-        
-        client = MQTTClient(mqtt_config, message_callback)
+    @pytest.mark.parametrize(
+        "reason_code,connected,should_reconnect",
+        [
+            (0, True, True),
+            (134, False, False),  # Bad username or password
+            # Not authorized, as a paho ReasonCode rather than an int
+            (ReasonCode(PacketTypes.CONNACK, identifier=135), False, False),
+            (136, False, True),  # Server unavailable
+            (128, False, True),  # Unspecified error
+        ],
+    )
+    def test_on_connect_reason_codes(
+        self, mock_client, client, reason_code, connected, should_reconnect
+    ):
+        """Test connection state after the connect callback for each reason code."""
+        mock_client.subscribe.return_value = (_ERR_SUCCESS, 1)
         client._subscribed_topics = ["test/topic"]
+        client._reconnect_delay = 16
         
-        # Simulate successful connection
-        client._on_connect(mock_client, None, {}, 0)
+        client._on_connect(mock_client, None, {}, reason_code, None)
         
         # Verify connection state
-        assert client._is_connected is True
-        assert client._reconnect_delay == 1
-        
-        # Verify resubscription
-        mock_client.subscribe.assert_called_once_with("test/topic", qos=0)
-
-    @patch("src.mqtt_client.mqtt.Client")
-    def test_on_connect_auth_failure(self, mock_client_class, mqtt_config, message_callback):
-        """Test connection callback with authentication failure."""
-        mock_client = MagicMock()
-        mock_client_class.return_value = mock_client
-        
-        client = MQTTClient(mqtt_config, message_callback)
-        
-        # Simulate authentication failure (rc=4)
-        client._on_connect(mock_client, None, {}, 4)
-        
-        # Verify connection state
-        assert client._is_connected is False
-        assert client._should_reconnect is False
-
-    @patch("src.mqtt_client.mqtt.Client")
-    def test_on_disconnect_unexpected(self, mock_client_class, mqtt_config, message_callback):
+        assert client._is_connected is connected
+        assert client._should_reconnect is should_reconnect
+        assert client.wait_for_connection(timeout=0) is connected
+        
+        if connected:
+            # Delay is reset and preset topics are resubscribed
+            assert client._reconnect_delay == 1
+            mock_client.subscribe.assert_called_once_with("test/topic", qos=0)
+        else:
+            mock_client.subscribe.assert_not_called()
+
+    def test_on_disconnect_unexpected(self, mock_client, client):
         """Test unexpected disconnection callback."""
-        mock_client = MagicMock()
-        mock_client_class.return_value = mock_client
-        
-        client = MQTTClient(mqtt_config, message_callback)
         client._is_connected = True
         client._reconnect_delay = 1
         
         # Simulate unexpected disconnection
-        with patch("time.sleep"):
-            client._on_disconnect(mock_client, None, 1)
+        client._on_disconnect(mock_client, None, {}, 1, None)
         
         # Verify disconnection state
         assert client._is_connected is False
@@ -269,17 +286,12 @@ class TestMQTTClientCallbacks:
         # Verify reconnection was attempted
         mock_client.reconnect.assert_called_once()
 
-    @patch("src.mqtt_client.mqtt.Client")
-    def test_on_disconnect_clean(self, mock_client_class, mqtt_config, message_callback):
+    def test_on_disconnect_clean(self, mock_client, client):
         """Test clean disconnection callback."""
-        mock_client = MagicMock()
-        mock_client_class.return_value = mock_client
-        
-        client = MQTTClient(mqtt_config, message_callback)
         client._is_connected = True
         
         # Simulate clean disconnection
-        client._on_disconnect(mock_client, None, 0)
+        client._on_disconnect(mock_client, None, {}, 0, None)
         
         # Verify disconnection state
         assert client._is_connected is False
@@ -287,109 +299,115 @@ class TestMQTTClientCallbacks:
         # Verify no reconnection attempt
         mock_client.reconnect.assert_not_called()
 
-    @patch("src.mqtt_client.mqtt.Client")
-    def test_on_message(self, mock_client_class, mqtt_config, message_callback):
+    def test_on_message(self, mock_client, client, message_callback):
         """Test message received callback."""
-        mock_client = MagicMock()
-        mock_client_class.return_value = mock_client
-        
-        client = MQTTClient(mqtt_config, message_callback)
         
-        # Create mock MQTT message
-        mock_msg = MagicMock()
-        mock_msg.topic = "test/topic"
-        mock_msg.payload = b"test payload"
+        # Create an MQTT message with the attributes paho provides
+        msg = SimpleNamespace(topic="test/topic", payload=b"test payload")
         
         # Simulate message received
-        client._on_message(mock_client, None, mock_msg)
+        client._on_message(mock_client, None, msg)
         
-        # Verify callback was invoked
-        message_callback.assert_called_once_with("test/topic", b"test payload")
+        # Verify message was queued rather than handled on the network thread
+        message_callback.assert_not_called()
+        assert client._message_queue.get_nowait() == ("test/topic", b"test payload")
 
-    @patch("src.mqtt_client.mqtt.Client")
-    def test_on_message_callback_exception(
-        self, mock_client_class, mqtt_config, message_callback
-    ):
-        """Test message callback exception handling."""
-        mock_client = MagicMock()
-        mock_client_class.return_value = mock_client
+    def test_on_message_queue_full(self, mock_client, client):
+        """Test that messages are dropped when the queue is full."""
+        client._message_queue = queue.Queue(maxsize=1)
+        
+        msg = SimpleNamespace(topic="test/topic", payload=b"test payload")
         
+        client._on_message(mock_client, None, msg)
+        client._on_message(mock_client, None, msg)
+        
+        assert client._message_queue.qsize() == 1
+        assert client._dropped_messages == 1
+
+    def test_consume_delivers_queued_messages(self, client, message_callback):
+        """Test that the worker delivers queued messages until stopped."""
+        client._message_queue.put(("test/topic", b"one"))
+        client._message_queue.put(("test/topic", b"two"))
+        client._message_queue.put(_STOP)
+        
+        client._consume()
+        
+        assert message_callback.call_args_list == [
+            call("test/topic", b"one"),
+            call("test/topic", b"two"),
+        ]
+
+    def test_consume_callback_exception(self, client, message_callback):
+        """Test message callback exception handling."""
         # Make callback raise exception
         message_callback.side_effect = Exception("Callback error")
         
-        client = MQTTClient(mqtt_config, message_callback)
+        client._message_queue.put(("test/topic", b"one"))
+        client._message_queue.put(("test/topic", b"two"))
+        client._message_queue.put(_STOP)
         
-        # Create mock MQTT message
-        mock_msg = MagicMock()
-        mock_msg.topic = "test/topic"
-        mock_msg.payload = b"test payload"
+        # Worker should keep going after a failing callback
+        client._consume()
         
-        # Simulate message received - should not raise exception
-        client._on_message(mock_client, None, mock_msg)
-
-
-class TestMQTTClientReconnection:
-    """Test MQTT client reconnection logic."""
+        assert message_callback.call_count == 2
 
-    @patch("src.mqtt_client.mqtt.Client")
-    @patch("time.sleep")
-    def test_exponential_backoff(
-        self, mock_sleep, mock_client_class, mqtt_config, message_callback
+    def test_workers_started_on_connect_and_stopped_on_disconnect(
+        self, mock_client, client, message_callback
     ):
-        """Test exponential backoff for reconnection."""
-        mock_client = MagicMock()
-        mock_client_class.return_value = mock_client
+        """Test the worker thread lifecycle and message delivery."""
+        client.connect()
+        workers = list(client._workers)
+        assert len(workers) == _WORKER_COUNT
+        assert all(worker.is_alive() for worker in workers)
         
-        client = MQTTClient(mqtt_config, message_callback)
-        client._is_connected = True
+        # Reconnecting doesn't start extra workers
+        client.connect()
+        assert client._workers == workers
         
-        # Simulate multiple disconnections
-        initial_delay = client._reconnect_delay
+        msg = SimpleNamespace(topic="test/topic", payload=b"test payload")
+        for _ in range(10):
+            client._on_message(mock_client, None, msg)
         
-        # First disconnection
-        client._on_disconnect(mock_client, None, 1)
-        assert client._reconnect_delay == initial_delay * 2
-        
-        # Second disconnection
-        client._on_disconnect(mock_client, None, 1)
-        assert client._reconnect_delay == initial_delay * 4
+        client.disconnect()
         
-        # Third disconnection
-        client._on_disconnect(mock_client, None, 1)
-        assert client._reconnect_delay == initial_delay * 8
+        assert not any(worker.is_alive() for worker in workers)
+        assert client._workers == []
+        assert message_callback.call_count == 10
 
-    @patch("src.mqtt_client.mqtt.Client")
-    @patch("time.sleep")
-    def test_max_reconnect_delay(
-        self, mock_sleep, mock_client_class, mqtt_config, message_callback
+
+class TestMQTTClientReconnection:
+    """Test MQTT client reconnection logic."""
+
+    @pytest.mark.parametrize(
+        "initial_delay,disconnects,expected_delay",
+        [
+            (1, 1, 2),
+            (1, 2, 4),
+            (1, 3, 8),
+            (32, 1, 60),  # Capped at the maximum delay
+            (60, 2, 60),
+        ],
+    )
+    def test_exponential_backoff(
+        self, mock_client, client, initial_delay, disconnects, expected_delay
     ):
-        """Test that reconnect delay doesn't exceed maximum."""
-        mock_client = MagicMock()
-        mock_client_class.return_value = mock_client
-        
-        client = MQTTClient(mqtt_config, message_callback)
+        """Test that the reconnect delay doubles per disconnection up to the maximum."""
         client._is_connected = True
-        client._reconnect_delay = 32  # Start near max
+        client._reconnect_delay = initial_delay
         
-        # Simulate disconnection
-        client._on_disconnect(mock_client, None, 1)
+        # Simulate repeated unexpected disconnections
+        for _ in range(disconnects):
+            client._on_disconnect(mock_client, None, {}, 1, None)
         
-        # Verify delay doesn't exceed max
+        assert client._reconnect_delay == expected_delay
         assert client._reconnect_delay <= client._max_reconnect_delay
 
-    @patch("src.mqtt_client.mqtt.Client")
-    def test_reconnect_on_successful_connection(
-        self, mock_client_class, mqtt_config, message_callback
-    ):
+    def test_reconnect_on_successful_connection(self, mock_client, client):
         """Test that reconnect delay resets on successful connection."""
-        mock_client = MagicMock()
-        mock_client_class.return_value = mock_client
-        
-        client = MQTTClient(mqtt_config, message_callback)
         client._reconnect_delay = 16  # Set to high value
         
         # Simulate successful connection
-        client._on_connect(mock_client, None, {}, 0)
+        client._on_connect(mock_client, None, {}, 0, None)
         
         # Verify delay was reset
         assert client._reconnect_delay == 1